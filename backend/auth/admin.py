@@ -0,0 +1,19 @@
+"""
+Admin authentication for operational endpoints.
+Admin requests must send the ADMIN_API_KEY environment variable's value in
+the X-Admin-Key header. Admin endpoints are disabled when it is not set.
+"""
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+
+def require_admin_key(x_admin_key: Optional[str] = Header(default=None)) -> None:
+    """FastAPI dependency that rejects requests without a valid admin key."""
+    expected = os.getenv("ADMIN_API_KEY")
+    if not expected:
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled (ADMIN_API_KEY not set)")
+    if not x_admin_key or not hmac.compare_digest(x_admin_key, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
@@ -6,7 +6,9 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 import os
+import time
 from pathlib import Path
+from typing import Dict, Optional
 
 # Use a persistent directory for database storage
 # Default to local directory when running outside Docker
@@ -80,13 +82,23 @@ class LeaderboardEntry(Base):
     last_submission = Column(DateTime, default=datetime.utcnow)
 
 
-async def init_db():
-    """Initialize database tables and seed initial data if empty."""
+async def init_db(timings: Optional[Dict[str, float]] = None):
+    """Initialize database tables and seed initial data if empty.
+    
+    If `timings` is given, the table setup ("db_init") and seeding ("seed")
+    durations are recorded in it, in milliseconds.
+    """
+    started = time.perf_counter()
     Base.metadata.create_all(bind=engine)
+    db_ready = time.perf_counter()
     
     # Seed initial data if database is empty
     from db.seed_data import seed_on_startup
     seed_on_startup()
+    
+    if timings is not None:
+        timings["db_init"] = round(1000 * (db_ready - started), 1)
+        timings["seed"] = round(1000 * (time.perf_counter() - db_ready), 1)
 
 
 def get_db():
@@ -1,23 +1,100 @@
 """
 Pydantic models for API requests/responses.
 """
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from pydantic import AfterValidator, BaseModel, Field
+from typing import Annotated, Optional, List, Dict, Any, Union
 from datetime import datetime
 
 
-class SearchRequest(BaseModel):
+def _require_text(value: str) -> str:
+    """Reject whitespace-only queries."""
+    if not value.strip():
+        raise ValueError("query must not be blank")
+    return value
+
+
+# A search query: blank queries would return arbitrary nearest neighbours
+QueryText = Annotated[str, Field(min_length=1), AfterValidator(_require_text)]
+
+
+class SearchOptions(BaseModel):
+    """Retrieval options shared by every knowledge base search request."""
+    mode: str = Field(
+        default="dense",
+        pattern="^(hybrid|dense|lexical)$",
+        description="Retrieval mode: dense (embeddings), lexical (BM25) or hybrid (both, rank-fused)"
+    )
+    filters: Optional[Dict[str, Union[str, int, float, bool, List[Union[str, int, float, bool]]]]] = Field(
+        default=None,
+        description='Only search documents whose metadata matches every key, e.g. {"zone": "B"}; '
+                    'a list value matches any of its elements'
+    )
+    rerank: bool = Field(
+        default=False,
+        description="Rescore the top candidates with a cross-encoder (scores are then cross-encoder "
+                    "relevance scores); falls back to the first-stage order if it exceeds its latency budget"
+    )
+    snippet: bool = Field(
+        default=False,
+        description="Attach the best-matching sentences of each result, with character offsets"
+    )
+    include_content: bool = Field(
+        default=True,
+        description="Return the full document content (set to false with snippet=true to shrink responses)"
+    )
+
+
+class SearchRequest(SearchOptions):
     """Request body for knowledge base search."""
-    query: str = Field(..., description="The search query")
+    query: QueryText = Field(..., description="The search query")
     top_k: int = Field(default=5, ge=1, le=20, description="Number of results to return")
+    expand_related: bool = Field(
+        default=False,
+        description="Legal KB only: attach the clauses that conflict with, qualify or reference each result"
+    )
+
+
+class BatchSearchRequest(SearchOptions):
+    """Request body for a batched multi-query knowledge base search."""
+    queries: List[QueryText] = Field(..., min_length=1, max_length=20, description="The search queries")
+    top_k: int = Field(default=5, ge=1, le=20, description="Number of results to return per query")
+
+
+class ExpandedSearchRequest(SearchOptions):
+    """Request body for a search over several formulations of one query."""
+    query: QueryText = Field(..., description="The claim or query")
+    variants: Optional[List[str]] = Field(
+        default=None,
+        max_length=10,
+        description="Reformulations of the query; if omitted, lexical variants are generated"
+    )
+    top_k: int = Field(default=5, ge=1, le=20, description="Number of results to return")
+
+
+class Snippet(BaseModel):
+    """A sentence of a search result, with character offsets into its content."""
+    text: str
+    start: int
+    end: int
+    score: float
+
+
+class RelatedClause(BaseModel):
+    """A clause linked to a search result, e.g. an exception that overrides it."""
+    doc_id: str
+    relation: str
+    content: str
+    metadata: Optional[Dict[str, Any]] = None
 
 
 class SearchResult(BaseModel):
     """A single search result from the knowledge base."""
     doc_id: str
-    content: str
+    content: Optional[str] = None
     score: float
     metadata: Optional[Dict[str, Any]] = None
+    snippets: Optional[List[Snippet]] = None
+    related: Optional[List[RelatedClause]] = None
 
 
 class SearchResponse(BaseModel):
@@ -27,6 +104,38 @@ class SearchResponse(BaseModel):
     total_results: int
 
 
+class ExpandedSearchResponse(BaseModel):
+    """Rank-fused results of an expanded search and the formulations used."""
+    results: List[SearchResult]
+    query: str
+    variants: List[str]
+    total_results: int
+
+
+class BatchSearchResponse(BaseModel):
+    """Response from a batched knowledge base search (one entry per query)."""
+    responses: List[SearchResponse]
+    total_queries: int
+
+
+class DocumentsRequest(BaseModel):
+    """Request body for fetching several knowledge base documents by id."""
+    doc_ids: List[str] = Field(..., min_length=1, max_length=100, description="Document ids to fetch")
+
+
+class Document(BaseModel):
+    """A knowledge base document."""
+    doc_id: str
+    content: str
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class DocumentsResponse(BaseModel):
+    """Documents found (in request order) and the ids that do not exist."""
+    documents: List[Document]
+    missing: List[str]
+
+
 class AgentResponse(BaseModel):
     """Expected response format from participant agents."""
     thought_process: str = Field(..., description="Chain of thought reasoning")
@@ -0,0 +1,47 @@
+"""
+Gunicorn config for the production server: uvicorn workers forked from a
+master that has already loaded the embedding model and the NumPy-backed
+knowledge bases (see knowledge_base/prefork.py).
+
+    gunicorn -c gunicorn.conf.py main:app
+
+WEB_CONCURRENCY sets the number of workers (default 2).
+An admin sync (POST /api/kb/<collection>/sync) runs in one worker; the others
+reload that KB before their next search (see vector_store.publish_sync_stamp).
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8006')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    """Runs in the master once, before any worker is forked."""
+    import asyncio
+    from db.database import engine, init_db
+    from knowledge_base.prefork import preload
+
+    # Create and seed the database once, instead of racing in every worker
+    asyncio.run(init_db())
+    engine.dispose()
+    os.environ["DB_INITIALIZED"] = "1"  # workers skip init_db (see main.lifespan)
+    server.log.info("Pre-fork load timings (ms): %s", preload())
+
+
+def pre_fork(server, worker):
+    from knowledge_base.vector_store import assert_fork_safe
+    assert_fork_safe()
+
+
+def post_fork(server, worker):
+    from db.database import engine
+    from knowledge_base.vector_store import reset_after_fork
+
+    # Pooled connections belong to the master; don't close them from here
+    engine.dispose(close=False)
+    reset_after_fork()
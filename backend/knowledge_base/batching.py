@@ -0,0 +1,147 @@
+"""
+Micro-batching of concurrent search calls.
+
+Evaluation waves produce bursts of concurrent single-query searches from the
+search thread pool. The coalescer below collects the calls that arrive within
+a short window (or until the batch is full), runs them as one batched encode
+plus one multi-query lookup, and hands every caller its own result. Batched
+MiniLM inference on CPU has far better throughput than one call per query.
+"""
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List
+
+
+class _Pending:
+    """One caller's request waiting to be batched."""
+
+    __slots__ = ("item", "event", "result", "error", "done", "promoted", "submitted_at")
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.done = False
+        self.promoted = False
+        self.submitted_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """Coalesces concurrent calls into batches for `execute`.
+
+    `execute` receives a list of items and must return one result per item,
+    in order. The first caller to arrive becomes the batch leader. A leader
+    that is alone in the queue runs right away, so an idle batcher adds no
+    latency; if other callers are already queued, it waits up to `window_ms`
+    for more (or until `max_batch` are queued). Callers arriving while a batch
+    runs queue up behind it and go out together as the next batch. The leader
+    runs the batch on its own thread and wakes the others; leftover callers
+    are handed the leadership, so no extra thread is needed.
+    """
+
+    def __init__(self, execute: Callable[[List[Any]], List[Any]], window_ms: float, max_batch: int):
+        self._execute = execute
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._cond = threading.Condition()
+        self._queue: List[_Pending] = []
+        self._leader = None
+        # Metrics
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._size_histogram: Counter = Counter()
+        self._total_exec = 0.0
+        self._max_exec = 0.0
+        self._total_queue_wait = 0.0
+
+    def submit(self, item: Any) -> Any:
+        """Add `item` to the next batch and block until its result is ready."""
+        request = _Pending(item)
+        with self._cond:
+            self._queue.append(request)
+            if self._leader is None:
+                self._leader = request
+                request.promoted = True
+            elif len(self._queue) >= self.max_batch:
+                self._cond.notify_all()
+
+        wait_for_window = True
+        while True:
+            if request.promoted:
+                request.promoted = False
+                self._lead(wait_for_window)
+            else:
+                request.event.wait()
+                request.event.clear()
+            if request.done:
+                break
+            # Woken up as the new leader: the window already passed while we
+            # waited, so run the next batch immediately
+            wait_for_window = False
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _lead(self, wait_for_window: bool) -> None:
+        with self._cond:
+            # Only wait when there is concurrency to coalesce
+            if wait_for_window and self.window and len(self._queue) > 1:
+                deadline = time.monotonic() + self.window
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            batch = self._queue[:self.max_batch]
+            del self._queue[:self.max_batch]
+
+        started = time.perf_counter()
+        try:
+            results = self._execute([request.item for request in batch])
+            for request, result in zip(batch, results):
+                request.result = result
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        elapsed = time.perf_counter() - started
+
+        with self._cond:
+            self._batches += 1
+            self._items += len(batch)
+            self._size_histogram[len(batch)] += 1
+            self._total_exec += elapsed
+            self._max_exec = max(self._max_exec, elapsed)
+            self._total_queue_wait += sum(started - request.submitted_at for request in batch)
+            if batch[0].error is not None:
+                self._errors += 1
+
+            if self._queue:
+                self._leader = self._queue[0]
+                self._leader.promoted = True
+                self._leader.event.set()
+            else:
+                self._leader = None
+
+        for request in batch:
+            request.done = True
+            request.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batch count, batch-size distribution and latencies (ms)."""
+        with self._cond:
+            return {
+                "window_ms": self.window * 1000,
+                "max_batch": self.max_batch,
+                "batches": self._batches,
+                "items": self._items,
+                "errors": self._errors,
+                "avg_batch_size": round(self._items / self._batches, 3) if self._batches else 0.0,
+                "batch_size_histogram": {str(size): n for size, n in sorted(self._size_histogram.items())},
+                "avg_batch_ms": round(1000 * self._total_exec / self._batches, 3) if self._batches else 0.0,
+                "max_batch_ms": round(1000 * self._max_exec, 3),
+                "avg_queue_wait_ms": round(1000 * self._total_queue_wait / self._items, 3) if self._items else 0.0,
+            }
@@ -0,0 +1,256 @@
+"""
+Retrieval quality and latency benchmark for the knowledge bases.
+
+Runs the dev questions (main.get_sample_questions) and the test questions
+(FACTCHECK_TEST_QUESTIONS / LEGAL_TEST_QUESTIONS) against every backend and
+search mode, and reports:
+- recall@k and hit rate@k against the expected ids in evaluation/judge.py
+  (dev questions count when their text matches a judged question)
+- p50/p95/p99 latency of sequential searches
+- throughput and latency at several concurrency levels
+
+    python -m knowledge_base.bench [--output bench_results.json] [--baseline old.json]
+
+Result and query-embedding caches are disabled unless --cache is given, so the
+numbers reflect the full search path rather than cache hits. Chroma
+collections are built in a temporary directory, so a benchmark never writes
+to the live collections (even while the server is running).
+"""
+import argparse
+import asyncio
+import json
+import platform
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+from knowledge_base import config
+
+COLLECTIONS = ("factcheck", "legal")
+
+
+def load_questions(collection: str) -> List[Dict[str, Any]]:
+    """Dev and test questions as {"id", "text", "expected_ids"}.
+
+    `expected_ids` is empty for questions without a judged answer; those only
+    count towards latency and throughput.
+    """
+    from evaluation.judge import FACTCHECK_GOLDEN_ANSWERS, LEGAL_GOLDEN_ANSWERS
+    from main import get_sample_questions
+    from submissions.router import FACTCHECK_TEST_QUESTIONS, LEGAL_TEST_QUESTIONS
+
+    if collection == "factcheck":
+        golden, test_questions = FACTCHECK_GOLDEN_ANSWERS, FACTCHECK_TEST_QUESTIONS
+        text_key, ids_key = "claim", "expected_doc_ids"
+    else:
+        golden, test_questions = LEGAL_GOLDEN_ANSWERS, LEGAL_TEST_QUESTIONS
+        text_key, ids_key = "query", "expected_clause_ids"
+
+    expected_by_text = {answer[text_key]: answer[ids_key] for answer in golden.values()}
+    dev_questions = asyncio.run(get_sample_questions(collection))["questions"]
+
+    questions = []
+    for question in dev_questions + test_questions:
+        expected = golden.get(question["id"], {}).get(ids_key)
+        if expected is None:
+            expected = expected_by_text.get(question[text_key], [])
+        questions.append({"id": question["id"], "text": question[text_key], "expected_ids": list(expected)})
+    return questions
+
+
+def retrieval_quality(
+    hits_per_question: List[List[Dict[str, Any]]],
+    questions: List[Dict[str, Any]],
+    ks: List[int],
+) -> Dict[str, Dict[str, float]]:
+    """Mean recall@k (share of expected ids retrieved) and hit rate@k (any
+    expected id retrieved, as the judge scores it) over judged questions."""
+    judged = [(hits, q["expected_ids"]) for hits, q in zip(hits_per_question, questions) if q["expected_ids"]]
+    recall, hit_rate = {}, {}
+    for k in ks:
+        scores = []
+        for hits, expected in judged:
+            retrieved = {hit["doc_id"] for hit in hits[:k]}
+            scores.append(len(retrieved & set(expected)) / len(expected))
+        recall[f"@{k}"] = round(float(np.mean(scores)), 4) if scores else None
+        hit_rate[f"@{k}"] = round(float(np.mean([s > 0 for s in scores])), 4) if scores else None
+    return {"recall": recall, "hit_rate": hit_rate}
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 and mean of a list of latencies in milliseconds."""
+    if not latencies_ms:
+        return {}
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(np.mean(latencies_ms)), 3),
+    }
+
+
+def _timed(search, text: str) -> tuple:
+    started = time.perf_counter()
+    hits = search(text)
+    return hits, 1000 * (time.perf_counter() - started)
+
+
+def run_throughput(search, texts: List[str], concurrency: int, requests: int) -> Dict[str, Any]:
+    """Issue `requests` searches (cycling through `texts`) from `concurrency` threads."""
+    workload = [texts[i % len(texts)] for i in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [ms for _, ms in pool.map(lambda text: _timed(search, text), workload)]
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "qps": round(requests / elapsed, 2),
+        "latency_ms": latency_summary(latencies),
+    }
+
+
+def benchmark(
+    kb,
+    questions: List[Dict[str, Any]],
+    mode: str,
+    ks: List[int],
+    repeat: int,
+    concurrency: List[int],
+    requests: int,
+) -> Dict[str, Any]:
+    """Quality, sequential latency and throughput of one KB in one mode."""
+    top_k = max(ks)
+    search = lambda text: kb.search(text, top_k=top_k, mode=mode)
+    texts = [q["text"] for q in questions]
+
+    search(texts[0])  # first call pays for lazy index builds
+    hits_per_question, latencies = [], []
+    for round_ in range(max(1, repeat)):
+        for text in texts:
+            hits, ms = _timed(search, text)
+            latencies.append(ms)
+            if round_ == 0:
+                hits_per_question.append(hits)
+
+    return {
+        "collection": kb.collection_name,
+        "backend": kb.backend,
+        "mode": mode,
+        "questions": len(questions),
+        "judged_questions": sum(1 for q in questions if q["expected_ids"]),
+        **retrieval_quality(hits_per_question, questions, ks),
+        "latency_ms": latency_summary(latencies),
+        "throughput": [run_throughput(search, texts, c, requests) for c in concurrency],
+    }
+
+
+def disable_caches() -> None:
+    """Turn off the search-result and query-embedding caches."""
+    from knowledge_base.vector_store import query_embedding_cache, search_result_cache
+
+    for cache in (query_embedding_cache, search_result_cache):
+        cache.clear()
+        cache.max_entries = 0
+
+
+def load_kb(collection: str, backend: str, chroma_client=None):
+    """Create and sync a KnowledgeBase for `collection` on `backend`.
+
+    Chroma collections are created with `chroma_client`, e.g. a scratch client.
+    """
+    from knowledge_base.vector_store import KnowledgeBase, sync_factcheck_kb, sync_legal_kb
+
+    kb = KnowledgeBase(collection, backend=backend, chroma_client=chroma_client)
+    (sync_factcheck_kb if collection == "factcheck" else sync_legal_kb)(kb)
+    return kb
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]]) -> None:
+    """Print recall and latency changes against a previous run."""
+    previous = {(r["collection"], r["backend"], r["mode"]): r for r in baseline}
+    for result in results:
+        old = previous.get((result["collection"], result["backend"], result["mode"]))
+        if old is None:
+            continue
+        k = max(result["recall"], key=lambda key: int(key[1:]))
+        recall_delta = (result["recall"][k] or 0) - (old["recall"].get(k) or 0)
+        p95_delta = result["latency_ms"]["p95"] - old["latency_ms"]["p95"]
+        print(f"  {result['collection']:<10} {result['backend']:<7} {result['mode']:<8} "
+              f"recall{k} {recall_delta:+.4f}  p95 {p95_delta:+.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark KB retrieval quality and latency")
+    parser.add_argument("--collections", default=",".join(COLLECTIONS))
+    parser.add_argument("--backends", default=",".join(config.BACKENDS))
+    parser.add_argument("--modes", default=",".join(config.SEARCH_MODES))
+    parser.add_argument("--k", default="1,3,5", help="comma-separated cutoffs for recall@k")
+    parser.add_argument("--repeat", type=int, default=5, help="sequential passes over the questions")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="searches per concurrency level")
+    parser.add_argument("--cache", action="store_true", help="keep the result and embedding caches on")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    ks = sorted({int(k) for k in args.k.split(",")})
+    concurrency = [int(c) for c in args.concurrency.split(",")]
+    if not args.cache:
+        disable_caches()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="kb-bench-") as scratch_path:
+        scratch_client = None
+        if "chroma" in args.backends.split(","):
+            import chromadb
+            from chromadb.config import Settings
+            scratch_client = chromadb.PersistentClient(
+                path=scratch_path, settings=Settings(anonymized_telemetry=False)
+            )
+        for collection in args.collections.split(","):
+            questions = load_questions(collection)
+            for backend in args.backends.split(","):
+                kb = load_kb(collection, backend, scratch_client)
+                for mode in args.modes.split(","):
+                    result = benchmark(kb, questions, mode, ks, args.repeat, concurrency, args.requests)
+                    results.append(result)
+                    top = max(result["throughput"], key=lambda t: t["qps"])
+                    print(f"{collection:<10} {backend:<7} {mode:<8} recall {result['recall']}  "
+                          f"p50/p95/p99 {result['latency_ms']['p50']}/{result['latency_ms']['p95']}/"
+                          f"{result['latency_ms']['p99']} ms  max {top['qps']} qps @ {top['concurrency']}")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "embedding_model": config.EMBEDDING_MODEL,
+            "embedding_backend": config.EMBEDDING_BACKEND,
+            "cache": args.cache,
+            "k": ks,
+            "repeat": args.repeat,
+            "concurrency": concurrency,
+            "requests": args.requests,
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if baseline is not None:
+        print(f"Changes against {args.baseline}:")
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
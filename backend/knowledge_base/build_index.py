@@ -0,0 +1,50 @@
+"""
+Build pre-embedded index artifacts for the knowledge bases.
+
+Run at image build time, after the embedding model has been downloaded:
+
+    python -m knowledge_base.build_index [--output-dir kb_index]
+
+Writes <collection>.json (ids, documents, metadata, model, content hash) and
+<collection>.npy (normalized float32 vectors) for both corpora. At startup
+vector_store loads a matching artifact instead of embedding the corpus.
+"""
+import argparse
+import time
+
+from knowledge_base import config
+from knowledge_base.data_loader import load_wikipedia_articles, load_zoning_laws
+from knowledge_base.embedding_store import write_index_artifact
+
+CORPORA = {
+    "factcheck": load_wikipedia_articles,
+    "legal": load_zoning_laws,
+}
+
+
+def build_index(output_dir: str) -> None:
+    """Embed every corpus and write its index artifact to `output_dir`."""
+    from knowledge_base.vector_store import EMBEDDING_MODEL, embedding_function
+
+    for collection_name, load_documents in CORPORA.items():
+        start = time.perf_counter()
+        documents = load_documents()
+        embeddings = embedding_function([doc["content"] for doc in documents])
+        path = write_index_artifact(output_dir, collection_name, documents, EMBEDDING_MODEL, embeddings)
+        print(f"Built {collection_name} index: {len(documents)} documents -> {path} "
+              f"({time.perf_counter() - start:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build pre-embedded KB index artifacts")
+    parser.add_argument(
+        "--output-dir",
+        default=config.INDEX_DIR,
+        help=f"Directory to write the artifacts to (default: {config.INDEX_DIR})"
+    )
+    args = parser.parse_args()
+    build_index(args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Passage chunking for long knowledge base documents.
+
+all-MiniLM-L6-v2 truncates its input at 256 word pieces, so embedding a whole
+Wikipedia-length article only represents its opening. Documents are split into
+overlapping word windows that fit the model; each passage records its parent
+document and character span so hits can be aggregated back to the parent
+`doc_id` that the judge expects.
+"""
+import re
+from typing import List, Dict, Any
+
+PASSAGE_ID_SEPARATOR = "#p"
+
+_WORD = re.compile(r"\S+")
+
+
+def split_into_passages(
+    doc: Dict[str, Any],
+    max_words: int = 180,
+    overlap_words: int = 40,
+) -> List[Dict[str, Any]]:
+    """Split a document into overlapping passages of at most `max_words` words.
+
+    Passage ids are "<doc_id>#p<n>". Each passage's metadata carries the
+    parent's metadata plus `parent_id`, `start_char` and `end_char` (offsets
+    into the parent content). Short documents yield a single passage equal to
+    the whole content.
+    """
+    content = doc["content"]
+    words = list(_WORD.finditer(content))
+    max_words = max(1, max_words)
+    step = max(1, max_words - max(0, overlap_words))
+    parent_metadata = dict(doc.get("metadata") or {})
+
+    spans = []
+    if len(words) <= max_words:
+        spans.append((0, len(content)))
+    else:
+        start = 0
+        while True:
+            window = words[start:start + max_words]
+            spans.append((window[0].start(), window[-1].end()))
+            if start + max_words >= len(words):
+                break
+            start += step
+
+    return [
+        {
+            "id": f"{doc['id']}{PASSAGE_ID_SEPARATOR}{n}",
+            "content": content[start_char:end_char],
+            "metadata": {
+                **parent_metadata,
+                "parent_id": doc["id"],
+                "start_char": start_char,
+                "end_char": end_char,
+            },
+        }
+        for n, (start_char, end_char) in enumerate(spans)
+    ]
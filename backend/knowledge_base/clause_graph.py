@@ -0,0 +1,120 @@
+"""
+Cross-reference graph over legal clauses.
+
+Zoning clauses are amended and overridden by other clauses: "clause_B_2" is
+qualified by "clause_B_2_conflict", "clause_R1_3" by "clause_R1_3_exception".
+The graph links each clause to the clauses that modify or reference it, so a
+search hit can be returned together with the clauses that conflict with it
+instead of the agent having to find them with extra searches.
+
+Edges come from three sources:
+- id suffixes: "<clause>_<relation>" modifies "<clause>" (relation is one of
+  RELATION_SUFFIXES)
+- metadata: section "2.1" in a zone qualifies section "2" of the same zone
+- content: a clause whose text mentions another clause references it, either
+  by id ("clause_B_2") or in the code's dotted form ("clause B.2",
+  "section HD.2", "Section R-1.3.1"), where the zone code is the one used in
+  the clause ids
+"""
+import re
+from collections import defaultdict
+from typing import Any, Dict, List
+
+RELATION_SUFFIXES = ("conflict", "exception", "amendment", "override", "update")
+
+# Relation seen from the modified clause for each kind of edge
+BASE_RELATION = "base_clause"
+SUBSECTION_RELATION = "subsection"
+PARENT_SECTION_RELATION = "parent_section"
+REFERENCES_RELATION = "references"
+REFERENCED_BY_RELATION = "referenced_by"
+
+_SUFFIX_PATTERN = re.compile(rf"^(?P<base>.+)_(?P<relation>{'|'.join(RELATION_SUFFIXES)})$")
+_CLAUSE_ID_PATTERN = re.compile(r"\bclause_[A-Za-z0-9_]+\b")
+# "clause_<code>_<number>[_<suffix>]", e.g. clause_R1_3_exception
+_ID_PARTS_PATTERN = re.compile(r"^clause_(?P<code>[A-Za-z0-9]+?)_(?P<number>\d+)(?:_|$)")
+# "clause B.2", "section HD.2", "Section R-1.3.1"
+_DOTTED_REFERENCE_PATTERN = re.compile(
+    r"\b(?:clause|section)\s+(?P<code>[A-Z]+(?:-?\d+)?)\.(?P<section>\d+(?:\.\d+)*)\b",
+    re.IGNORECASE,
+)
+
+
+def _normalize_code(code: str) -> str:
+    return code.replace("-", "").upper()
+
+
+def _dotted_reference_ids(documents: List[Dict[str, Any]]) -> Dict[tuple, str]:
+    """Map (zone code, section) to clause ids, e.g. ("R1", "3.1") to
+    clause_R1_3_exception, using the code in the id and the section metadata."""
+    by_reference = {}
+    for doc in documents:
+        match = _ID_PARTS_PATTERN.match(doc["id"])
+        if not match:
+            continue
+        code = _normalize_code(match.group("code"))
+        section = (doc.get("metadata") or {}).get("section")
+        if section is not None:
+            by_reference.setdefault((code, str(section)), doc["id"])
+        if doc["id"] == f"clause_{match.group('code')}_{match.group('number')}":
+            by_reference.setdefault((code, match.group("number")), doc["id"])
+    return by_reference
+
+
+class ClauseGraph:
+    """Undirected clause graph with a relation label on each direction."""
+
+    def __init__(self, documents: List[Dict[str, Any]]):
+        """Build the graph from documents shaped like the data_loader output."""
+        self._edges: Dict[str, Dict[str, str]] = defaultdict(dict)
+        ids = {doc["id"] for doc in documents}
+
+        # Id suffixes: clause_B_2_conflict <-> clause_B_2
+        for doc in documents:
+            match = _SUFFIX_PATTERN.match(doc["id"])
+            if match and match.group("base") in ids:
+                self._link(match.group("base"), doc["id"], match.group("relation"), BASE_RELATION)
+
+        # Sub-sections: section "2.1" of a zone qualifies section "2"
+        by_section = {}
+        for doc in documents:
+            metadata = doc.get("metadata") or {}
+            if metadata.get("section") is not None:
+                by_section[(metadata.get("zone"), str(metadata["section"]))] = doc["id"]
+        for (zone, section), doc_id in by_section.items():
+            if "." in section:
+                parent = by_section.get((zone, section.rsplit(".", 1)[0]))
+                if parent is not None:
+                    self._link(parent, doc_id, SUBSECTION_RELATION, PARENT_SECTION_RELATION)
+
+        # Mentions of another clause in the text, by id or dotted reference
+        by_reference = _dotted_reference_ids(documents)
+        for doc in documents:
+            mentioned = set(_CLAUSE_ID_PATTERN.findall(doc["content"]))
+            for match in _DOTTED_REFERENCE_PATTERN.finditer(doc["content"]):
+                key = (_normalize_code(match.group("code")), match.group("section"))
+                if key in by_reference:
+                    mentioned.add(by_reference[key])
+            for referenced in sorted(mentioned):
+                if referenced in ids and referenced != doc["id"]:
+                    self._link(referenced, doc["id"], REFERENCED_BY_RELATION, REFERENCES_RELATION)
+
+    def _link(self, target: str, source: str, relation_from_target: str, relation_from_source: str) -> None:
+        # The first (most specific) relation found for a pair wins
+        self._edges[target].setdefault(source, relation_from_target)
+        self._edges[source].setdefault(target, relation_from_source)
+
+    def __len__(self) -> int:
+        """Number of edges."""
+        return sum(len(neighbours) for neighbours in self._edges.values()) // 2
+
+    def related(self, doc_id: str) -> List[Dict[str, str]]:
+        """Clauses linked to `doc_id` as {"doc_id", "relation"}, sorted by id.
+
+        The relation describes the linked clause from `doc_id`'s side, e.g.
+        "conflict" for the clause that conflicts with it.
+        """
+        return [
+            {"doc_id": other, "relation": relation}
+            for other, relation in sorted(self._edges.get(doc_id, {}).items())
+        ]
@@ -0,0 +1,185 @@
+"""
+Knowledge base configuration, read from environment variables.
+"""
+import os
+from typing import Dict
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting, falling back to the default if unset or invalid."""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float setting, falling back to the default if unset or invalid."""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def collection_setting(collection: str, name: str, default: str) -> str:
+    """Read a per-collection setting.
+    
+    `KB_<COLLECTION>_<NAME>` (e.g. KB_LEGAL_BACKEND) wins over the global
+    `KB_<NAME>`, which wins over `default`.
+    """
+    specific = os.getenv(f"KB_{collection.upper()}_{name.upper()}")
+    if specific:
+        return specific
+    return os.getenv(f"KB_{name.upper()}", default)
+
+
+# Vector backend per collection: "chroma" (persistent HNSW) or "numpy"
+# (in-memory exact search, best for corpora of a few thousand documents)
+BACKENDS = ("chroma", "numpy")
+DEFAULT_BACKEND = "chroma"
+
+
+def collection_backend(collection: str) -> str:
+    """Return the configured vector backend for a collection."""
+    backend = collection_setting(collection, "backend", DEFAULT_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown KB backend for {collection}: {backend} (expected one of {BACKENDS})")
+    return backend
+
+
+# Vector quantization for the numpy backend: "none" (float32) or "int8"
+# (scalar-quantized search, top candidates rescored with the float32 vectors)
+QUANTIZATIONS = ("none", "int8")
+RESCORE_MULTIPLIER = _env_int("KB_RESCORE_MULTIPLIER", 4)  # float-rescored candidates = top_k * N
+
+
+def collection_quantization(collection: str) -> str:
+    """Return the configured vector quantization for a collection."""
+    quantization = collection_setting(collection, "quantization", "none").lower()
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(
+            f"Unknown KB quantization for {collection}: {quantization} (expected one of {QUANTIZATIONS})"
+        )
+    return quantization
+
+
+# HNSW index parameters for chroma-backend collections: M (links per node),
+# construction_ef (build-time candidate list) and search_ef (query-time
+# candidate list). Higher values trade latency and memory for recall; unset
+# parameters keep Chroma's defaults (M=16, construction_ef=100, search_ef=10).
+HNSW_PARAMS = ("M", "construction_ef", "search_ef")
+
+
+def collection_hnsw(collection: str) -> Dict[str, int]:
+    """Return the configured HNSW parameters for a collection as Chroma
+    collection metadata, e.g. {"hnsw:M": 32, "hnsw:search_ef": 64}."""
+    params = {}
+    for param in HNSW_PARAMS:
+        value = collection_setting(collection, f"hnsw_{param}", "")
+        if not value:
+            continue
+        try:
+            number = int(value)
+        except ValueError:
+            number = 0
+        if number <= 0:
+            raise ValueError(f"Invalid KB HNSW {param} for {collection}: {value} (expected a positive integer)")
+        params[f"hnsw:{param}"] = number
+    return params
+
+
+# Sentence-transformers model used for documents and queries
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Embedding backend: "sentence_transformers" (torch) or "onnx" (int8 model run
+# by onnxruntime; export it with `python -m knowledge_base.onnx_embedding export`)
+EMBEDDING_BACKEND = os.getenv("KB_EMBEDDING_BACKEND", "sentence_transformers").lower()
+ONNX_MODEL_DIR = os.getenv(
+    "KB_ONNX_MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "onnx_model")
+)
+ONNX_NUM_THREADS = _env_int("KB_ONNX_NUM_THREADS", 0)  # 0 = onnxruntime default
+
+
+# Build-time index artifacts (python -m knowledge_base.build_index)
+INDEX_DIR = os.getenv(
+    "KB_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "kb_index")
+)
+
+
+# Sync stamps: POST /api/kb/<collection>/sync replaces a file here so that the
+# other worker processes reload that KB before their next search
+SYNC_STAMP_DIR = os.getenv(
+    "KB_SYNC_STAMP_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "kb_sync")
+)
+
+
+# Shared embedding service (python -m knowledge_base.embedding_service): when
+# the socket is set, workers send texts there instead of loading the model
+EMBEDDING_SERVICE_SOCKET = os.getenv("KB_EMBEDDING_SERVICE_SOCKET", "")
+EMBEDDING_SERVICE_TIMEOUT = _env_float("KB_EMBEDDING_SERVICE_TIMEOUT", 30.0)
+EMBEDDING_SERVICE_WINDOW_MS = _env_float("KB_EMBEDDING_SERVICE_WINDOW_MS", 5.0)
+EMBEDDING_SERVICE_MAX_BATCH = _env_int("KB_EMBEDDING_SERVICE_MAX_BATCH", 64)
+# Listen backlog of the service socket: all worker threads may connect at once
+EMBEDDING_SERVICE_BACKLOG = _env_int("KB_EMBEDDING_SERVICE_BACKLOG", 256)
+# How long a worker keeps retrying to connect (backlog full, service restarting)
+EMBEDDING_SERVICE_CONNECT_TIMEOUT = _env_float("KB_EMBEDDING_SERVICE_CONNECT_TIMEOUT", 5.0)
+
+
+# Passage chunking per collection ("on"/"off"): long documents are split into
+# overlapping passages that are indexed in a <collection>_passages collection
+# and aggregated back to their parent document at query time
+PASSAGE_MAX_WORDS = _env_int("KB_PASSAGE_MAX_WORDS", 180)
+PASSAGE_OVERLAP_WORDS = _env_int("KB_PASSAGE_OVERLAP_WORDS", 40)
+PASSAGE_CANDIDATES_MULTIPLIER = _env_int("KB_PASSAGE_CANDIDATES_MULTIPLIER", 4)
+
+
+def collection_chunking(collection: str) -> bool:
+    """Return whether passage chunking is enabled for a collection."""
+    return collection_setting(collection, "chunking", "off").lower() in ("1", "on", "true", "yes")
+
+
+# Query-embedding cache (in front of the embedding function)
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = _env_int("KB_QUERY_EMBEDDING_CACHE_MAX_ENTRIES", 50_000)
+QUERY_EMBEDDING_CACHE_MAX_MB = _env_float("KB_QUERY_EMBEDDING_CACHE_MAX_MB", 64.0)
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = _env_float("KB_QUERY_EMBEDDING_CACHE_TTL_SECONDS", 6 * 3600)
+
+# Search-result cache ((collection, corpus version, query, top_k) -> results)
+SEARCH_RESULT_CACHE_MAX_ENTRIES = _env_int("KB_SEARCH_RESULT_CACHE_MAX_ENTRIES", 20_000)
+SEARCH_RESULT_CACHE_MAX_MB = _env_float("KB_SEARCH_RESULT_CACHE_MAX_MB", 128.0)
+SEARCH_RESULT_CACHE_TTL_SECONDS = _env_float("KB_SEARCH_RESULT_CACHE_TTL_SECONDS", 3600)
+
+# Hybrid (BM25 + dense) retrieval
+SEARCH_MODES = ("dense", "lexical", "hybrid")
+HYBRID_CANDIDATES_MULTIPLIER = _env_int("KB_HYBRID_CANDIDATES_MULTIPLIER", 4)  # candidates per ranking = top_k * N
+RRF_K = _env_int("KB_RRF_K", 60)
+
+# Cross-encoder reranking (opt-in per request with rerank=true)
+RERANK_MODEL = os.getenv("KB_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = _env_int("KB_RERANK_CANDIDATES", 20)  # first-stage hits rescored per query
+RERANK_BUDGET_MS = _env_float("KB_RERANK_BUDGET_MS", 250.0)  # past this, keep the first-stage order
+RERANK_CACHE_MAX_ENTRIES = _env_int("KB_RERANK_CACHE_MAX_ENTRIES", 200_000)
+RERANK_CACHE_TTL_SECONDS = _env_float("KB_RERANK_CACHE_TTL_SECONDS", 6 * 3600)
+
+# Snippets (snippet=true): sentences returned per hit, and whether sentence
+# embeddings are computed at ingest. Off by default: precomputing encodes every
+# sentence on every boot, even when the document vectors come from a pre-built
+# index, so sentences are embedded on first use per document instead.
+SNIPPET_SENTENCES = _env_int("KB_SNIPPET_SENTENCES", 2)
+SNIPPET_PRECOMPUTE = os.getenv("KB_SNIPPET_PRECOMPUTE", "off").lower() in ("1", "on", "true", "yes")
+
+# Load both KBs and warm the embedding model at startup; /ready reports 503
+# until this is done
+WARMUP = os.getenv("KB_WARMUP", "on").lower() in ("1", "on", "true", "yes")
+
+# Search thread pool (keeps embedding/vector lookups off the event loop)
+SEARCH_WORKERS = _env_int("KB_SEARCH_WORKERS", 4)
+SEARCH_MAX_QUEUE = _env_int("KB_SEARCH_MAX_QUEUE", 64)  # waiting tasks before 503s
+
+# Micro-batching of concurrent dense searches (window 0 disables coalescing).
+# A lone search never waits for the window. Each waiting search holds a search
+# thread, so batches never exceed SEARCH_WORKERS (or BATCH_MAX_SIZE).
+BATCH_WINDOW_MS = _env_float("KB_BATCH_WINDOW_MS", 2.0)
+BATCH_MAX_SIZE = _env_int("KB_BATCH_MAX_SIZE", 16)
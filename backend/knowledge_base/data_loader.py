@@ -6,11 +6,13 @@ import os
 from typing import List, Dict, Any
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
+WIKIPEDIA_ARTICLES_FILE = os.path.join(DATA_DIR, "wikipedia_articles", "articles.json")
+ZONING_LAWS_FILE = os.path.join(DATA_DIR, "zoning_laws", "alphaville_code.json")
 
 
 def load_wikipedia_articles() -> List[Dict[str, Any]]:
     """Load Wikipedia articles for the fact-checking challenge."""
-    articles_file = os.path.join(DATA_DIR, "wikipedia_articles", "articles.json")
+    articles_file = WIKIPEDIA_ARTICLES_FILE
     
     if os.path.exists(articles_file):
         with open(articles_file, "r") as f:
@@ -22,7 +24,7 @@ def load_wikipedia_articles() -> List[Dict[str, Any]]:
 
 def load_zoning_laws() -> List[Dict[str, Any]]:
     """Load zoning law documents for the legal challenge."""
-    laws_file = os.path.join(DATA_DIR, "zoning_laws", "alphaville_code.json")
+    laws_file = ZONING_LAWS_FILE
     
     if os.path.exists(laws_file):
         with open(laws_file, "r") as f:
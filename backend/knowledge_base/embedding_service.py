@@ -0,0 +1,229 @@
+"""
+Out-of-process embedding service for multi-worker deployments.
+
+With several uvicorn workers, every process would load its own copy of torch
+and the embedding model. Instead, one service process owns the model and the
+workers send it texts over a Unix domain socket. Requests arriving from all
+workers within a short window are coalesced into a single encoder call.
+
+Run the service next to the workers and point them at its socket:
+
+    python -m knowledge_base.embedding_service --socket /tmp/kb-embedding.sock
+    KB_EMBEDDING_SERVICE_SOCKET=/tmp/kb-embedding.sock uvicorn main:app --workers 4
+
+Wire format (both directions): a 4-byte big-endian length followed by a JSON
+header; a response header is followed by `nbytes` of float32 row-major data.
+A {"stats": true} request returns the service's batching metrics.
+"""
+import argparse
+import errno
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from knowledge_base import config
+from knowledge_base.batching import MicroBatcher
+
+_LENGTH = struct.Struct(">I")
+
+# Connect errors worth retrying: the listen backlog is full (EAGAIN on a Unix
+# socket) or the service is (re)starting
+_RETRY_CONNECT_ERRNOS = {errno.EAGAIN, errno.ECONNREFUSED, errno.ENOENT}
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    chunks = []
+    while n:
+        chunk = sock.recv(min(n, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Embedding service connection closed")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_message(sock: socket.socket, header: Dict[str, Any], payload: bytes = b"") -> None:
+    """Send a length-prefixed JSON header, followed by an optional raw payload."""
+    data = json.dumps(header).encode("utf-8")
+    sock.sendall(_LENGTH.pack(len(data)) + data + payload)
+
+
+def recv_message(sock: socket.socket) -> Tuple[Dict[str, Any], bytes]:
+    """Receive a header (and its `nbytes` payload, if any)."""
+    (length,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    header = json.loads(_recv_exact(sock, length).decode("utf-8"))
+    payload = _recv_exact(sock, header["nbytes"]) if header.get("nbytes") else b""
+    return header, payload
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves embedding requests from KB workers, batching across connections."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        socket_path: str,
+        embed: Callable[[List[str]], Any],
+        window_ms: float,
+        max_batch: int,
+        backlog: int = config.EMBEDDING_SERVICE_BACKLOG,
+    ):
+        # socketserver's default backlog of 5 refuses connections when many
+        # worker threads connect at once
+        self.request_queue_size = backlog
+        self.embed = embed
+        self.batcher = MicroBatcher(self._embed_batch, window_ms, max_batch)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # stale socket from a previous run
+        super().__init__(socket_path, _EmbeddingRequestHandler)
+
+    def _embed_batch(self, requests: List[List[str]]) -> List[np.ndarray]:
+        """Encode the texts of several requests in one call and split the rows."""
+        texts = [text for request in requests for text in request]
+        vectors = np.asarray(self.embed(texts), dtype=np.float32) if texts else np.zeros((0, 0), np.float32)
+        out, offset = [], 0
+        for request in requests:
+            out.append(vectors[offset:offset + len(request)])
+            offset += len(request)
+        return out
+
+
+class _EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    """Handles one worker connection; each worker thread keeps its own."""
+
+    def handle(self):
+        while True:
+            try:
+                header, _ = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                if header.get("stats"):
+                    send_message(self.request, {"stats": self.server.batcher.stats()})
+                    continue
+                vectors = self.server.batcher.submit(list(header["texts"]))
+                vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+                send_message(
+                    self.request,
+                    {"shape": list(vectors.shape), "nbytes": vectors.nbytes},
+                    vectors.tobytes(),
+                )
+            except (ConnectionError, OSError):
+                return
+            except Exception as e:
+                send_message(self.request, {"error": str(e)})
+
+
+class RemoteEmbeddingFunction:
+    """Chroma-compatible embedding function that calls the embedding service.
+
+    Each thread keeps one connection to the service and reconnects once if
+    the connection was dropped (e.g. the service restarted). Connecting is
+    retried with backoff for up to `connect_timeout` seconds while the
+    service's backlog is full or it is not listening yet.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        timeout: float = 30.0,
+        connect_timeout: float = config.EMBEDDING_SERVICE_CONNECT_TIMEOUT,
+    ):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        deadline = time.monotonic() + self.connect_timeout
+        delay = 0.005
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError as e:
+                sock.close()
+                if e.errno not in _RETRY_CONNECT_ERRNOS or time.monotonic() + delay > deadline:
+                    raise
+                time.sleep(delay)
+                delay = min(2 * delay, 0.25)
+                continue
+            self._local.sock = sock
+            return sock
+
+    def _close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def _request(self, texts: List[str]) -> np.ndarray:
+        sock = getattr(self._local, "sock", None) or self._connect()
+        send_message(sock, {"texts": texts})
+        header, payload = recv_message(sock)
+        if header.get("error"):
+            raise RuntimeError(f"Embedding service error: {header['error']}")
+        return np.frombuffer(payload, dtype=np.float32).reshape(header["shape"])
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the service's cross-worker batching metrics."""
+        sock = getattr(self._local, "sock", None) or self._connect()
+        send_message(sock, {"stats": True})
+        header, _ = recv_message(sock)
+        return header["stats"]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into float32 vectors (one row per text)."""
+        texts = list(texts)
+        try:
+            return self._request(texts)
+        except (ConnectionError, OSError):
+            self._close()
+            try:
+                return self._request(texts)
+            except (ConnectionError, OSError):
+                self._close()
+                raise
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.encode(input).tolist()
+
+
+def main():
+    from knowledge_base.vector_store import create_local_embedding_function
+
+    parser = argparse.ArgumentParser(description="Shared embedding service for KB workers")
+    parser.add_argument("--socket", default=config.EMBEDDING_SERVICE_SOCKET or "/tmp/kb-embedding.sock")
+    parser.add_argument("--window-ms", type=float, default=config.EMBEDDING_SERVICE_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=config.EMBEDDING_SERVICE_MAX_BATCH)
+    parser.add_argument("--backlog", type=int, default=config.EMBEDDING_SERVICE_BACKLOG)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    embed = create_local_embedding_function()
+    embed(["warmup"])
+    print(f"Embedding model loaded in {1000 * (time.perf_counter() - started):.0f} ms")
+
+    server = EmbeddingServer(args.socket, embed, args.window_ms, args.max_batch, args.backlog)
+    print(f"Embedding service listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Persisted document embeddings for the knowledge base corpora.
+
+Each corpus's embeddings are saved as an L2-normalized float32 `.npy` matrix
+next to its JSON source file, keyed by a hash of the corpus content and the
+embedding model name. On startup the matrix is memory-mapped instead of
+re-embedding the corpus, and worker processes share the mapped pages.
+
+Index artifacts (see `knowledge_base.build_index`) are the build-time variant:
+ids, documents, metadata and vectors for a collection, baked into the image.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from typing import List, Dict, Any, Callable, Optional
+
+import numpy as np
+
+from knowledge_base.numpy_store import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+
+def corpus_hash(documents: List[Dict[str, Any]]) -> str:
+    """Hash the ids and contents of a corpus (in order)."""
+    digest = hashlib.sha256()
+    for doc in documents:
+        digest.update(json.dumps([doc["id"], doc["content"]], ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def _path_prefix(data_file: str, model_name: str) -> str:
+    base, _ = os.path.splitext(data_file)
+    model_slug = re.sub(r"[^A-Za-z0-9_.-]+", "-", model_name)
+    return f"{base}.{model_slug}."
+
+
+def embeddings_path(data_file: str, model_name: str, content_hash: str) -> str:
+    """Path of the embedding matrix for a corpus file, model and content hash."""
+    return f"{_path_prefix(data_file, model_name)}{content_hash[:16]}.npy"
+
+
+def _save_atomic(path: str, matrix: np.ndarray) -> None:
+    """Write the matrix via a temp file + rename so readers never see a partial file."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npy.tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, matrix)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _remove_stale(path: str, model_name: str, data_file: str) -> None:
+    """Delete matrices for older versions of the same corpus and model."""
+    prefix = os.path.basename(_path_prefix(data_file, model_name))
+    directory = os.path.dirname(path)
+    for name in os.listdir(directory):
+        candidate = os.path.join(directory, name)
+        if name.startswith(prefix) and name.endswith(".npy") and candidate != path:
+            try:
+                os.remove(candidate)
+            except OSError:
+                pass
+
+
+def find_corpus_embeddings(
+    documents: List[Dict[str, Any]],
+    data_file: str,
+    model_name: str,
+) -> Optional[np.ndarray]:
+    """Return the persisted (memory-mapped) matrix for `documents`, or None."""
+    path = embeddings_path(data_file, model_name, corpus_hash(documents))
+    if not os.path.exists(path):
+        return None
+    try:
+        matrix = np.load(path, mmap_mode="r")
+    except (OSError, ValueError) as e:
+        logger.warning("Could not load embedding file %s: %s", path, e)
+        return None
+    if matrix.shape[0] != len(documents) or matrix.dtype != np.float32:
+        logger.warning("Ignoring mismatched embedding file %s", path)
+        return None
+    return matrix
+
+
+def load_corpus_embeddings(
+    documents: List[Dict[str, Any]],
+    data_file: str,
+    model_name: str,
+    embed: Callable[[List[str]], List[List[float]]],
+) -> np.ndarray:
+    """Return normalized embeddings for `documents`, one row per document.
+
+    Loads the persisted matrix with mmap_mode="r" when it matches the corpus
+    and model; otherwise embeds the corpus once with `embed` and persists it.
+    If the data directory is not writable the freshly computed matrix is
+    returned in memory.
+    """
+    path = embeddings_path(data_file, model_name, corpus_hash(documents))
+
+    matrix = find_corpus_embeddings(documents, data_file, model_name)
+    if matrix is not None:
+        logger.info("Memory-mapped %d corpus embeddings from %s", len(documents), path)
+        return matrix
+
+    matrix = normalize_rows(embed([doc["content"] for doc in documents]))
+    try:
+        _save_atomic(path, matrix)
+        _remove_stale(path, model_name, data_file)
+        logger.info("Persisted %d corpus embeddings to %s", len(documents), path)
+        return np.load(path, mmap_mode="r")
+    except OSError as e:
+        logger.warning("Could not persist corpus embeddings to %s: %s", path, e)
+        return matrix
+
+
+def index_artifact_paths(index_dir: str, collection_name: str) -> tuple:
+    """Return the (manifest .json, vectors .npy) paths of a collection's artifact."""
+    base = os.path.join(index_dir, collection_name)
+    return f"{base}.json", f"{base}.npy"
+
+
+def write_index_artifact(
+    index_dir: str,
+    collection_name: str,
+    documents: List[Dict[str, Any]],
+    model_name: str,
+    embeddings: np.ndarray,
+) -> str:
+    """Write a ready-to-load index for a collection and return the manifest path."""
+    manifest_path, vectors_path = index_artifact_paths(index_dir, collection_name)
+    _save_atomic(vectors_path, normalize_rows(embeddings))
+    manifest = {
+        "collection": collection_name,
+        "model": model_name,
+        "content_hash": corpus_hash(documents),
+        "ids": [doc["id"] for doc in documents],
+        "documents": [doc["content"] for doc in documents],
+        "metadatas": [doc.get("metadata", {}) for doc in documents],
+    }
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
+
+
+def load_index_artifact(index_dir: str, collection_name: str, model_name: str) -> Optional[Dict[str, Any]]:
+    """Load a collection's index artifact, or None if missing or built for another model.
+
+    The returned dict holds the manifest fields plus `embeddings`, a
+    memory-mapped float32 matrix with one row per id.
+    """
+    manifest_path, vectors_path = index_artifact_paths(index_dir, collection_name)
+    if not (os.path.exists(manifest_path) and os.path.exists(vectors_path)):
+        return None
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        embeddings = np.load(vectors_path, mmap_mode="r")
+    except (OSError, ValueError) as e:
+        logger.warning("Could not load index artifact for %s: %s", collection_name, e)
+        return None
+    if manifest.get("model") != model_name or embeddings.shape[0] != len(manifest.get("ids", [])):
+        logger.warning("Ignoring index artifact for %s: built for another model or corpus", collection_name)
+        return None
+    manifest["embeddings"] = embeddings
+    return manifest
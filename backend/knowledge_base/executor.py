@@ -0,0 +1,134 @@
+"""
+Bounded thread pool for knowledge base work.
+
+Embedding and vector lookups are CPU-bound and synchronous. Running them on
+this pool keeps the event loop free for submissions, leaderboard reads and
+health checks, and the queue-depth limit turns overload into fast 503s
+instead of an ever-growing backlog.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from knowledge_base import config
+
+
+class SearchOverloadedError(RuntimeError):
+    """Raised when the search pool's queue is full."""
+
+
+class SearchExecutor:
+    """Thread pool with a bounded queue and basic latency metrics."""
+
+    def __init__(self, max_workers: int, max_queue: int, name: str = "kb-search"):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._name = name
+        self._pool = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._max_queued = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+        self._max_wait = 0.0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix=self._name
+                    )
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` on the pool and await its result.
+
+        Raises SearchOverloadedError if every worker is busy and the number of
+        waiting tasks has reached the queue limit.
+        """
+        with self._lock:
+            if self._queued + self._running >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise SearchOverloadedError(
+                    f"Search queue is full ({self._queued} waiting), please retry shortly"
+                )
+            self._queued += 1
+            self._submitted += 1
+            self._max_queued = max(self._max_queued, self._queued)
+
+        enqueued_at = time.perf_counter()
+
+        def task():
+            started_at = time.perf_counter()
+            wait = started_at - enqueued_at
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            failed = False
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._total_run += time.perf_counter() - started_at
+                    if failed:
+                        self._failed += 1
+                    else:
+                        self._completed += 1
+
+        future = self._get_pool().submit(task)
+        future.add_done_callback(self._release_if_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _release_if_cancelled(self, future) -> None:
+        # A task cancelled before it started (e.g. the client went away) never
+        # ran its own bookkeeping, so take it off the queue here
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, throughput counters and average latencies (ms)."""
+        with self._lock:
+            finished = self._completed + self._failed
+            started = finished + self._running
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._queued,
+                "max_queued": self._max_queued,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(1000 * self._total_wait / started, 3) if started else 0.0,
+                "max_wait_ms": round(1000 * self._max_wait, 3),
+                "avg_run_ms": round(1000 * self._total_run / finished, 3) if finished else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker threads (a new pool is created on next use)."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+search_executor = SearchExecutor(
+    max_workers=config.SEARCH_WORKERS,
+    max_queue=config.SEARCH_MAX_QUEUE,
+)
@@ -0,0 +1,167 @@
+"""
+Offline sweep of Chroma HNSW parameters.
+
+Builds a scratch copy of a collection for every combination of M,
+construction_ef and search_ef (Chroma fixes all three when a collection is
+created) and reports, per setting:
+- build time
+- ANN recall@k: overlap with the exact (brute-force) top-k
+- recall@k against the expected ids of the judged questions (see bench.py)
+- p50/p95/p99 query latency on the dev and test questions
+
+    python -m knowledge_base.hnsw_sweep --collection legal \\
+        --m 8,16,32 --construction-ef 50,100,200 --search-ef 10,50,100
+
+Pick a setting and apply it with KB_<COLLECTION>_HNSW_M,
+KB_<COLLECTION>_HNSW_CONSTRUCTION_EF and KB_<COLLECTION>_HNSW_SEARCH_EF. The
+live collections are never touched: the scratch collections live in a
+temporary directory and are built from the corpus vectors.
+"""
+import argparse
+import itertools
+import json
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from knowledge_base.bench import latency_summary, load_questions, retrieval_quality
+from knowledge_base.numpy_store import normalize_rows
+
+
+def load_corpus(collection: str):
+    """Documents and their embedding matrix (precomputed when available)."""
+    from knowledge_base import data_loader
+    from knowledge_base.vector_store import corpus_vectors
+
+    if collection == "factcheck":
+        documents = data_loader.load_wikipedia_articles()
+        data_file = data_loader.WIKIPEDIA_ARTICLES_FILE
+    else:
+        documents = data_loader.load_zoning_laws()
+        data_file = data_loader.ZONING_LAWS_FILE
+    vectors = corpus_vectors(collection, documents, data_file)(list(range(len(documents))))
+    return documents, np.asarray(vectors, dtype=np.float32)
+
+
+def evaluate_setting(
+    client,
+    name: str,
+    hnsw: Dict[str, int],
+    documents: List[Dict[str, Any]],
+    vectors: np.ndarray,
+    questions: List[Dict[str, Any]],
+    query_vectors: np.ndarray,
+    exact_ids: List[List[str]],
+    k: int,
+    repeat: int,
+) -> Dict[str, Any]:
+    """Build a scratch collection with `hnsw` and measure it."""
+    from knowledge_base.vector_store import get_or_create_collection
+
+    started = time.perf_counter()
+    collection = get_or_create_collection(name, hnsw, client=client)
+    batch = client.max_batch_size
+    for start in range(0, len(documents), batch):
+        rows = documents[start:start + batch]
+        collection.add(
+            ids=[doc["id"] for doc in rows],
+            embeddings=vectors[start:start + batch].tolist(),
+        )
+    build_ms = 1000 * (time.perf_counter() - started)
+
+    n_results = min(k, len(documents))
+    latencies, hits_per_question = [], []
+    for round_ in range(max(1, repeat)):
+        for vector in query_vectors:
+            started = time.perf_counter()
+            ids = collection.query(query_embeddings=[vector.tolist()], n_results=n_results, include=[])["ids"][0]
+            latencies.append(1000 * (time.perf_counter() - started))
+            if round_ == 0:
+                hits_per_question.append([{"doc_id": doc_id} for doc_id in ids])
+    client.delete_collection(name)
+
+    ann_recall = np.mean([
+        len({hit["doc_id"] for hit in hits} & set(exact)) / len(exact)
+        for hits, exact in zip(hits_per_question, exact_ids)
+    ])
+    return {
+        "hnsw": hnsw,
+        "build_ms": round(build_ms, 1),
+        "ann_recall": round(float(ann_recall), 4),
+        **retrieval_quality(hits_per_question, questions, [k]),
+        "latency_ms": latency_summary(latencies),
+    }
+
+
+def sweep(
+    collection: str,
+    ms: List[int],
+    construction_efs: List[int],
+    search_efs: List[int],
+    k: int = 5,
+    repeat: int = 5,
+) -> Dict[str, Any]:
+    """Evaluate every HNSW parameter combination for `collection`."""
+    import chromadb
+    from chromadb.config import Settings
+    from knowledge_base.vector_store import embedding_function
+
+    documents, vectors = load_corpus(collection)
+    questions = load_questions(collection)
+    query_vectors = normalize_rows(embedding_function([q["text"] for q in questions]))
+    scores = query_vectors @ normalize_rows(vectors).T
+    exact_ids = [
+        [documents[i]["id"] for i in np.argsort(-row, kind="stable")[:min(k, len(documents))]]
+        for row in scores
+    ]
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="hnsw-sweep-") as path:
+        client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+        for i, (m, construction_ef, search_ef) in enumerate(itertools.product(ms, construction_efs, search_efs)):
+            hnsw = {"hnsw:M": m, "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef}
+            result = evaluate_setting(
+                client, f"hnsw_sweep_{i}", hnsw, documents, vectors,
+                questions, query_vectors, exact_ids, k, repeat,
+            )
+            results.append(result)
+            print(f"M={m:<4} construction_ef={construction_ef:<5} search_ef={search_ef:<5} "
+                  f"ann_recall@{k} {result['ann_recall']:.4f}  recall@{k} {result['recall'][f'@{k}']}  "
+                  f"p50/p95 {result['latency_ms']['p50']}/{result['latency_ms']['p95']} ms  "
+                  f"build {result['build_ms']} ms")
+
+    return {
+        "collection": collection,
+        "documents": len(documents),
+        "questions": len(questions),
+        "k": k,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep Chroma HNSW parameters for a KB collection")
+    parser.add_argument("--collection", choices=("factcheck", "legal"), default="factcheck")
+    parser.add_argument("--m", type=_int_list, default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=_int_list, default=[50, 100, 200])
+    parser.add_argument("--search-ef", type=_int_list, default=[10, 50, 100])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5, help="query passes per setting")
+    parser.add_argument("--output", default="hnsw_sweep.json")
+    args = parser.parse_args()
+
+    report = sweep(args.collection, args.m, args.construction_ef, args.search_ef, args.k, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
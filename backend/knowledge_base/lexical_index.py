@@ -0,0 +1,160 @@
+"""
+Lexical (BM25) retrieval and rank fusion for the knowledge bases.
+
+Dense MiniLM embeddings are weak on exact tokens such as years ("1889"),
+counts ("206") or clause numbers ("4.2.1", "R-1"). The BM25 index below is
+built from the same documents as the vector collection and can be used on its
+own or fused with the dense ranking via reciprocal-rank fusion.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+# Compound tokens keep their inner punctuation ("4.2.1", "r-1", "a-commercial")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+SUBTOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have i in is it its my
+of on or that the this to was were what when where which who will with
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case and split text into index terms.
+
+    Compound tokens are emitted whole and as their parts, so "R-1" matches both
+    "r-1" and a bare "1", and "Clause 4.2.1" matches "4.2.1" exactly.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        parts = SUBTOKEN_PATTERN.findall(token)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part not in STOPWORDS)
+    return terms
+
+
+ENTITY_PATTERN = re.compile(r"[A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)*")
+NUMBER_PATTERN = re.compile(r"\d")
+
+
+def lexical_variants(query: str) -> List[str]:
+    """Cheap reformulations of a query for server-side query expansion.
+
+    Returns (deduplicated, without the query itself):
+    - the content words, without stopwords and punctuation
+    - the content words without numbers, since a claim that gets a year or
+      count wrong would otherwise rank documents by that wrong number
+    - the capitalized phrases ("Eiffel Tower World's Fair")
+    """
+    words = [token for token in TOKEN_PATTERN.findall(query.lower()) if token not in STOPWORDS]
+    entities = [
+        " ".join(word for word in phrase.split() if word.lower() not in STOPWORDS)
+        for phrase in ENTITY_PATTERN.findall(query)
+    ]
+    candidates = [
+        " ".join(words),
+        " ".join(word for word in words if not NUMBER_PATTERN.search(word)),
+        " ".join(entity for entity in entities if entity),
+    ]
+
+    seen = {" ".join(query.lower().split())}
+    variants = []
+    for variant in candidates:
+        if variant and variant.lower() not in seen:
+            seen.add(variant.lower())
+            variants.append(variant)
+    return variants
+
+
+class BM25Index:
+    """In-memory BM25 (Okapi) inverted index over a list of documents."""
+
+    def __init__(self, documents: List[Dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        """Build the index from documents shaped like the data_loader output
+        (`id`, `content`, optional `metadata`)."""
+        self.k1 = k1
+        self.b = b
+        self.documents = documents
+        self.doc_ids = [doc["id"] for doc in documents]
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+
+        for idx, doc in enumerate(documents):
+            term_counts = Counter(tokenize(doc["content"]))
+            self.doc_lengths.append(sum(term_counts.values()))
+            for term, tf in term_counts.items():
+                self.postings[term].append((idx, tf))
+
+        n_docs = len(documents)
+        self.avg_doc_length = (sum(self.doc_lengths) / n_docs) if n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        candidate_ids: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[int, float]]:
+        """Return up to `top_k` (document index, BM25 score) pairs, best first.
+
+        If `candidate_ids` is given, only those documents are scored.
+        """
+        allowed = None
+        if candidate_ids is not None:
+            allowed = set(candidate_ids)
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf[term]
+            for idx, tf in posting:
+                if allowed is not None and self.doc_ids[idx] not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[idx] / self.avg_doc_length)
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:top_k]
+
+    def search_documents(
+        self,
+        query: str,
+        top_k: int = 5,
+        candidate_ids: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Search and return hits in the KnowledgeBase result format."""
+        return [
+            {
+                "doc_id": self.doc_ids[idx],
+                "content": self.documents[idx]["content"],
+                "score": score,
+                "metadata": self.documents[idx].get("metadata") or {},
+            }
+            for idx, score in self.search(query, top_k, candidate_ids)
+        ]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several rankings of doc ids with reciprocal-rank fusion.
+
+    Each document scores sum(1 / (k + rank)) over the rankings it appears in
+    (rank starting at 1). Returns (doc_id, fused score) pairs, best first.
+    """
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])
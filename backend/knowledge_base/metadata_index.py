@@ -0,0 +1,69 @@
+"""
+Inverted index over document metadata for filtered search.
+
+Maps each (metadata key, value) pair to the ids of the documents carrying it,
+so a filter such as {"zone": "B"} resolves to its candidate ids with a few set
+lookups instead of a scan, and only that subset is scored.
+"""
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Set
+
+FILTER_VALUE_TYPES = (str, int, float, bool)
+
+
+def validate_filters(filters: Optional[Dict[str, Any]]) -> None:
+    """Raise ValueError unless every filter value is a scalar or a list of scalars."""
+    for key, value in (filters or {}).items():
+        values = value if isinstance(value, list) else [value]
+        if not all(isinstance(v, FILTER_VALUE_TYPES) for v in values):
+            raise ValueError(f"Unsupported filter value for {key!r}: {value!r}")
+
+
+def filter_key(filters: Optional[Dict[str, Any]]) -> tuple:
+    """Hashable, order-independent form of a filter, for cache keys."""
+    return tuple(
+        (key, tuple(value) if isinstance(value, list) else value)
+        for key, value in sorted((filters or {}).items())
+    )
+
+
+def chroma_where(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Translate a filter into a ChromaDB `where` clause."""
+    clauses = [
+        {key: {"$in": value}} if isinstance(value, list) else {key: value}
+        for key, value in sorted(filters.items())
+    ]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class MetadataIndex:
+    """Inverted index from metadata values to document ids."""
+
+    def __init__(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        self.ids = list(ids)
+        self.postings: Dict[str, Dict[Any, Set[str]]] = defaultdict(lambda: defaultdict(set))
+        for doc_id, metadata in zip(self.ids, metadatas):
+            for key, value in (metadata or {}).items():
+                if isinstance(value, FILTER_VALUE_TYPES):
+                    self.postings[key][value].add(doc_id)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def candidates(self, filters: Dict[str, Any]) -> Set[str]:
+        """Ids of documents matching every key of `filters`.
+
+        A list value matches any of its elements. Values are compared exactly,
+        so "1" and 1 are different values, as in a ChromaDB `where` clause.
+        """
+        validate_filters(filters)
+        matched = None
+        for key, value in filters.items():
+            by_value = self.postings.get(key, {})
+            ids = set()
+            for v in (value if isinstance(value, list) else [value]):
+                ids |= by_value.get(v, set())
+            matched = ids if matched is None else matched & ids
+            if not matched:
+                return set()
+        return matched if matched is not None else set(self.ids)
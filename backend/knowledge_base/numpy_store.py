@@ -0,0 +1,329 @@
+"""
+In-memory exact-search backend for small knowledge bases.
+
+Holds L2-normalized document embeddings in one contiguous float32 matrix and
+answers queries with a single matmul plus argpartition. It implements the
+subset of the ChromaDB collection API that KnowledgeBase uses, so the two
+backends are interchangeable per collection.
+
+For larger corpora the collection can also keep an int8 scalar-quantized copy
+of the vectors (per-dimension scale and offset). Queries are then scored
+against the int8 codes, a quarter of the float32 size, and only the top
+candidates are rescored with the float32 vectors, so results keep exact
+cosine scores. The float32 matrix is then kept memory-mapped (spilled to an
+unlinked temporary file if it was built in memory), so only the rescored rows
+are paged in and the resident vector memory is roughly the int8 copy.
+"""
+import os
+import tempfile
+import threading
+from typing import List, Dict, Any, Optional, Callable, NamedTuple
+
+import numpy as np
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Return a C-contiguous float32 copy of `vectors` with unit-length rows."""
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms)
+
+
+def _is_normalized_matrix(vectors) -> bool:
+    """True for a C-contiguous float32 2-D array whose rows are unit length."""
+    if not isinstance(vectors, np.ndarray) or vectors.ndim != 2:
+        return False
+    if vectors.dtype != np.float32 or not vectors.flags["C_CONTIGUOUS"]:
+        return False
+    return bool(np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-3))
+
+
+# Rows of int8 codes converted to float32 at a time while scoring, which
+# bounds the temporary memory of a quantized search
+QUANTIZED_CHUNK_ROWS = 16384
+
+
+class QuantizedMatrix(NamedTuple):
+    """int8 codes with per-dimension scale/offset: x ~= offset + scale * (code + 128)."""
+    codes: np.ndarray
+    scale: np.ndarray
+    offset: np.ndarray
+
+
+def quantize_rows(matrix: np.ndarray) -> QuantizedMatrix:
+    """Scalar-quantize each dimension of `matrix` to int8 over its own range."""
+    low = matrix.min(axis=0)
+    high = matrix.max(axis=0)
+    scale = (high - low) / 255.0
+    scale[scale == 0] = 1.0
+    codes = np.rint((matrix - low) / scale) - 128
+    return QuantizedMatrix(
+        np.ascontiguousarray(np.clip(codes, -128, 127), dtype=np.int8),
+        scale.astype(np.float32),
+        low.astype(np.float32),
+    )
+
+
+def approximate_scores(queries: np.ndarray, quantized: QuantizedMatrix, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Dot products of queries with the dequantized rows, up to a per-query
+    constant (so rankings, not values, are exact to the quantization error).
+
+    q . x = q . offset + (q * scale) . (code + 128); the first and last terms
+    don't depend on the row, so only (q * scale) . code is computed, chunk by
+    chunk over the int8 codes.
+    """
+    weights = np.ascontiguousarray(queries * quantized.scale, dtype=np.float32)
+    n_rows = len(rows) if rows is not None else len(quantized.codes)
+    scores = np.empty((len(queries), n_rows), dtype=np.float32)
+    for start in range(0, n_rows, QUANTIZED_CHUNK_ROWS):
+        stop = min(start + QUANTIZED_CHUNK_ROWS, n_rows)
+        chunk = quantized.codes[rows[start:stop]] if rows is not None else quantized.codes[start:stop]
+        scores[:, start:stop] = weights @ chunk.astype(np.float32).T
+    return scores
+
+
+def _is_memory_mapped(matrix: np.ndarray) -> bool:
+    base = matrix
+    while base is not None:
+        if isinstance(base, np.memmap):
+            return True
+        base = getattr(base, "base", None)
+    return False
+
+
+def spill_to_disk(matrix: np.ndarray) -> np.ndarray:
+    """Return a read-only memory-mapped copy of `matrix`.
+
+    The backing file is unlinked right away; the mapping keeps it alive until
+    the array is garbage collected, so nothing is left behind on disk.
+    """
+    fd, path = tempfile.mkstemp(prefix="kb-vectors-", suffix=".npy")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, matrix)
+        return np.load(path, mmap_mode="r")
+    finally:
+        os.remove(path)
+
+
+class _Snapshot(NamedTuple):
+    """Immutable view of the store; replaced wholesale on every write."""
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    embeddings: np.ndarray
+    positions: Dict[str, int]
+    quantized: Optional[QuantizedMatrix] = None
+
+
+class NumpyCollection:
+    """Exact cosine-similarity search over an in-memory embedding matrix.
+
+    With `quantization="int8"`, candidates are found on the int8 copy of the
+    vectors and the top `n_results * rescore_multiplier` are rescored exactly.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        embedding_function: Optional[Callable] = None,
+        quantization: str = "none",
+        rescore_multiplier: int = 4,
+    ):
+        self.name = name
+        self._embedding_function = embedding_function
+        self.quantization = quantization
+        self.rescore_multiplier = max(1, rescore_multiplier)
+        self._write_lock = threading.Lock()
+        self._snapshot = _Snapshot([], [], [], np.zeros((0, 0), dtype=np.float32), {})
+
+    def count(self) -> int:
+        return len(self._snapshot.ids)
+
+    def _embed(self, documents: List[str], embeddings) -> np.ndarray:
+        if embeddings is None:
+            if self._embedding_function is None:
+                raise ValueError("No embeddings given and no embedding function configured")
+            embeddings = self._embedding_function(documents)
+        if _is_normalized_matrix(embeddings):
+            # Already in storage layout (e.g. a memory-mapped corpus matrix): use
+            # it without copying so processes keep sharing the mapped pages
+            return embeddings
+        return normalize_rows(embeddings)
+
+    def add(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        embeddings=None,
+    ) -> None:
+        """Add new documents; existing ids are rejected like in Chroma."""
+        duplicates = set(ids) & set(self._snapshot.positions)
+        if duplicates:
+            raise ValueError(f"IDs already exist in collection {self.name}: {sorted(duplicates)[:5]}")
+        self.upsert(ids, documents, metadatas, embeddings)
+
+    def upsert(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        embeddings=None,
+    ) -> None:
+        """Insert documents, replacing any that already exist."""
+        if not ids:
+            return
+        metadatas = metadatas if metadatas is not None else [{} for _ in ids]
+        vectors = self._embed(documents, embeddings)
+        with self._write_lock:
+            current = self._snapshot
+            new_ids = set(ids)
+            keep = [i for i, doc_id in enumerate(current.ids) if doc_id not in new_ids]
+            if keep:
+                matrix = np.vstack([current.embeddings[keep], vectors])
+            else:
+                matrix = vectors
+            self._set_snapshot(
+                [current.ids[i] for i in keep] + list(ids),
+                [current.documents[i] for i in keep] + list(documents),
+                [current.metadatas[i] for i in keep] + [m or {} for m in metadatas],
+                matrix,
+            )
+
+    def delete(self, ids: List[str]) -> None:
+        """Remove documents by id (unknown ids are ignored)."""
+        with self._write_lock:
+            current = self._snapshot
+            removed = set(ids)
+            keep = [i for i, doc_id in enumerate(current.ids) if doc_id not in removed]
+            self._set_snapshot(
+                [current.ids[i] for i in keep],
+                [current.documents[i] for i in keep],
+                [current.metadatas[i] for i in keep],
+                current.embeddings[keep] if current.embeddings.size else current.embeddings,
+            )
+
+    def _set_snapshot(self, ids, documents, metadatas, embeddings) -> None:
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        quantized = None
+        if self.quantization == "int8" and embeddings.size:
+            quantized = quantize_rows(embeddings)
+            if not _is_memory_mapped(embeddings):
+                embeddings = spill_to_disk(embeddings)
+        self._snapshot = _Snapshot(
+            ids,
+            documents,
+            metadatas,
+            embeddings,
+            {doc_id: i for i, doc_id in enumerate(ids)},
+            quantized,
+        )
+
+    def vector_bytes(self) -> Dict[str, int]:
+        """Size of the float32 vectors and of their int8 copy, in bytes."""
+        snapshot = self._snapshot
+        return {
+            "float32": int(snapshot.embeddings.nbytes),
+            "int8": int(snapshot.quantized.codes.nbytes) if snapshot.quantized is not None else 0,
+        }
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        include: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Fetch documents by id (or all documents), Chroma-style."""
+        include = include if include is not None else ["documents", "metadatas"]
+        snapshot = self._snapshot
+        if ids is None:
+            rows = list(range(len(snapshot.ids)))
+        else:
+            rows = [snapshot.positions[doc_id] for doc_id in ids if doc_id in snapshot.positions]
+        return {
+            "ids": [snapshot.ids[r] for r in rows],
+            "documents": [snapshot.documents[r] for r in rows] if "documents" in include else None,
+            "metadatas": [snapshot.metadatas[r] for r in rows] if "metadatas" in include else None,
+            "embeddings": snapshot.embeddings[rows].tolist() if "embeddings" in include else None,
+        }
+
+    def query(
+        self,
+        query_embeddings=None,
+        query_texts: Optional[List[str]] = None,
+        n_results: int = 10,
+        include: Optional[List[str]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Top-k by cosine similarity; distances are 1 - similarity, as in a
+        Chroma collection with hnsw:space=cosine. Scores are always exact; with
+        int8 quantization only the candidate shortlist is approximate.
+
+        `ids` (not part of the Chroma API) restricts scoring to those
+        documents, e.g. the candidates of a metadata filter.
+        """
+        include = include if include is not None else ["documents", "metadatas", "distances"]
+        if query_embeddings is None:
+            query_embeddings = self._embedding_function(query_texts)
+        queries = normalize_rows(query_embeddings)
+        snapshot = self._snapshot
+
+        if ids is None:
+            rows = np.arange(len(snapshot.ids))
+        else:
+            rows = np.array(
+                sorted(snapshot.positions[doc_id] for doc_id in set(ids) if doc_id in snapshot.positions),
+                dtype=np.int64,
+            )
+
+        n_docs = len(rows)
+        k = min(n_results, n_docs)
+        if not k:
+            top_rows, top_scores = [[] for _ in queries], [[] for _ in queries]
+        elif snapshot.quantized is not None and k * self.rescore_multiplier < n_docs:
+            top_rows, top_scores = self._quantized_top_k(snapshot, queries, rows if ids is not None else None, k)
+        else:
+            matrix = snapshot.embeddings if ids is None else snapshot.embeddings[rows]
+            scores = queries @ matrix.T
+            top_rows, top_scores = [], []
+            for q in range(len(queries)):
+                top = _top_k(scores[q], k)
+                top_rows.append(rows[top])
+                top_scores.append(scores[q][top])
+
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for q_rows, q_scores in zip(top_rows, top_scores):
+            out["ids"].append([snapshot.ids[r] for r in q_rows])
+            out["documents"].append([snapshot.documents[r] for r in q_rows])
+            out["metadatas"].append([snapshot.metadatas[r] for r in q_rows])
+            out["distances"].append([float(1.0 - score) for score in q_scores])
+
+        for field in ("documents", "metadatas", "distances"):
+            if field not in include:
+                out[field] = None
+        return out
+
+    def _quantized_top_k(self, snapshot: _Snapshot, queries: np.ndarray, rows: Optional[np.ndarray], k: int):
+        """Shortlist on the int8 codes, then rescore the shortlist in float32."""
+        approximate = approximate_scores(queries, snapshot.quantized, rows)
+        n_candidates = k * self.rescore_multiplier
+        top_rows, top_scores = [], []
+        for q in range(len(queries)):
+            shortlist = _top_k(approximate[q], n_candidates)
+            candidates = rows[shortlist] if rows is not None else shortlist
+            candidates = np.sort(candidates)  # sequential reads of the (mapped) float rows
+            exact = snapshot.embeddings[candidates] @ queries[q]
+            top = _top_k(exact, k)
+            top_rows.append(candidates[top])
+            top_scores.append(exact[top])
+        return top_rows, top_scores
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first (ties keep index order)."""
+    if k < len(scores):
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind="stable")]
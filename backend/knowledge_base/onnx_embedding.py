@@ -0,0 +1,233 @@
+"""
+Int8-quantized ONNX embedding function for CPU inference.
+
+Runs an int8 export of all-MiniLM-L6-v2 through onnxruntime instead of torch,
+which cuts query-embedding latency, startup time and RSS. Embeddings are mean
+pooled and L2-normalized exactly like the sentence-transformers pipeline, so
+they can query collections built with SentenceTransformerEmbeddingFunction.
+
+Export (needs torch + onnx, done at image build time) and parity check:
+
+    python -m knowledge_base.onnx_embedding export [--output-dir onnx_model]
+    python -m knowledge_base.onnx_embedding parity [--max-drift 0.05] [--strict]
+
+The parity check compares both embedding paths on the corpus and the judged
+questions. It measures cosine drift (1 - cosine similarity per text) and
+how much of each question's top-k documents stays the same. The report is
+saved next to the model (parity.json) and logged whenever the ONNX backend
+loads. Going past the limits only prints a warning, unless --strict is given;
+tests/test_onnx_embedding.py fails on them whenever an exported model is
+present.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Dict, List
+
+import numpy as np
+
+from knowledge_base import config
+
+MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+PARITY_FILE = "parity.json"
+MAX_SEQ_LENGTH = 256  # same as all-MiniLM-L6-v2's sentence-transformers config
+
+# Warning thresholds: worst per-text cosine drift, and mean share of each
+# question's top-k documents kept. Dynamic int8 quantization usually keeps
+# drift well below the drift limit. The overlap limit is what actually guards
+# search results; near-ties can swap a document at the cut-off, so it is
+# below 1.
+DEFAULT_MAX_DRIFT = 0.05
+DEFAULT_MIN_OVERLAP = 0.9
+PARITY_TOP_K = 5
+
+logger = logging.getLogger(__name__)
+
+
+class OnnxEmbeddingFunction:
+    """Chroma-compatible embedding function backed by onnxruntime."""
+
+    def __init__(self, model_dir: str = config.ONNX_MODEL_DIR, num_threads: int = 0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, MODEL_FILE)
+        tokenizer_path = os.path.join(model_dir, TOKENIZER_FILE)
+        if not (os.path.exists(model_path) and os.path.exists(tokenizer_path)):
+            raise FileNotFoundError(
+                f"ONNX model not found in {model_dir}; run `python -m knowledge_base.onnx_embedding export`"
+            )
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._log_parity(model_dir)
+
+    @staticmethod
+    def _log_parity(model_dir: str) -> None:
+        """Log the parity report recorded when the model was exported."""
+        path = os.path.join(model_dir, PARITY_FILE)
+        if not os.path.exists(path):
+            logger.warning("No ONNX parity report in %s; run `python -m knowledge_base.onnx_embedding parity`", model_dir)
+            return
+        with open(path) as f:
+            report = json.load(f)
+        log = logger.info if report.get("passed") else logger.warning
+        log("ONNX parity: mean drift %.5f, max drift %.5f, top-%d overlap %.3f (%s)",
+            report["mean_drift"], report["max_drift"], report["top_k"], report["top_k_overlap"],
+            "within limits" if report.get("passed") else "OUTSIDE LIMITS")
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.encode(input).tolist()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into unit-length float32 vectors (one row per text)."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        encodings = self.tokenizer.encode_batch(list(texts))
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalization
+        mask = attention_mask[:, :, None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+def export_quantized_model(output_dir: str, model_name: str) -> str:
+    """Export the sentence-transformers model to int8 ONNX plus tokenizer.json."""
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(output_dir, "model_fp32.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    int8_path = os.path.join(output_dir, MODEL_FILE)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    for leftover in (fp32_path, f"{fp32_path}.data"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, TOKENIZER_FILE))
+    return int8_path
+
+
+def parity_texts() -> Dict[str, List[str]]:
+    """Corpus documents and test questions, to compare both embedding paths on."""
+    from knowledge_base.data_loader import load_wikipedia_articles, load_zoning_laws
+    from evaluation.judge import FACTCHECK_GOLDEN_ANSWERS, LEGAL_GOLDEN_ANSWERS
+
+    return {
+        "documents": [doc["content"] for doc in load_wikipedia_articles() + load_zoning_laws()],
+        "queries": [answer["claim"] for answer in FACTCHECK_GOLDEN_ANSWERS.values()]
+        + [answer["query"] for answer in LEGAL_GOLDEN_ANSWERS.values()],
+    }
+
+
+def check_parity(model_dir: str, model_name: str, documents: List[str], queries: List[str],
+                 top_k: int = PARITY_TOP_K) -> dict:
+    """Compare ONNX int8 and sentence-transformers embeddings.
+
+    Returns the mean, p99 and worst-case cosine drift over all texts, and
+    the mean share of each query's top-k documents that both embeddings
+    retrieve.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    texts = documents + queries
+    reference = SentenceTransformer(model_name, device="cpu").encode(
+        texts, normalize_embeddings=True, convert_to_numpy=True
+    )
+    candidate = OnnxEmbeddingFunction(model_dir).encode(texts)
+    drift = 1.0 - np.sum(reference * candidate, axis=1)
+
+    top_k = min(top_k, len(documents))
+
+    def top_k_ids(vectors: np.ndarray) -> List[set]:
+        scores = vectors[len(documents):] @ vectors[:len(documents)].T
+        return [set(np.argsort(-row, kind="stable")[:top_k]) for row in scores]
+
+    overlap = [len(a & b) / top_k for a, b in zip(top_k_ids(reference), top_k_ids(candidate))]
+    return {
+        "texts": len(texts),
+        "mean_drift": float(drift.mean()),
+        "p99_drift": float(np.percentile(drift, 99)),
+        "max_drift": float(drift.max()),
+        "top_k": top_k,
+        "top_k_overlap": float(np.mean(overlap)) if overlap else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Int8 ONNX export and parity check for the KB embedder")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("--output-dir", default=config.ONNX_MODEL_DIR)
+    parser.add_argument("--max-drift", type=float, default=DEFAULT_MAX_DRIFT,
+                        help="Flag the model if any text drifts more than this (1 - cosine)")
+    parser.add_argument("--min-overlap", type=float, default=DEFAULT_MIN_OVERLAP,
+                        help=f"Flag the model if queries keep less of their top-{PARITY_TOP_K} documents")
+    parser.add_argument("--strict", action="store_true", help="Exit non-zero when the model is flagged")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        path = export_quantized_model(args.output_dir, config.EMBEDDING_MODEL)
+        print(f"Exported int8 ONNX model to {path}")
+        return
+
+    texts = parity_texts()
+    report = check_parity(args.output_dir, config.EMBEDDING_MODEL, texts["documents"], texts["queries"])
+    report["max_drift_limit"] = args.max_drift
+    report["min_overlap_limit"] = args.min_overlap
+    report["passed"] = report["max_drift"] <= args.max_drift and report["top_k_overlap"] >= args.min_overlap
+    with open(os.path.join(args.output_dir, PARITY_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"ONNX parity over {report['texts']} texts: mean drift {report['mean_drift']:.5f}, "
+          f"p99 drift {report['p99_drift']:.5f}, max drift {report['max_drift']:.5f}, "
+          f"top-{report['top_k']} overlap {report['top_k_overlap']:.3f}")
+    if not report["passed"]:
+        print(f"WARNING: outside limits (max drift {args.max_drift}, top-k overlap {args.min_overlap}); "
+              "keep KB_EMBEDDING_BACKEND=sentence_transformers or re-check the export")
+        if args.strict:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Pre-fork loading for the multi-process production server.
+
+With gunicorn's `preload_app`, the master process loads what its workers can
+share copy-on-write before forking them: the embedding model weights and the
+NumPy-backed knowledge bases (vectors, lexical and metadata indexes). Each
+worker then only opens what cannot cross a fork.
+
+ChromaDB's PersistentClient holds SQLite connections, HNSW index handles and
+threads, none of which survive a fork, so the master never opens it. Chroma
+collections are synced to the corpus in a short-lived child process instead;
+the workers open their own clients afterwards and find nothing to write.
+
+Check that forked workers come up and can search:
+
+    python -m knowledge_base.prefork --check
+
+tests/test_prefork.py runs this check, and a sync in one worker followed by
+the reload in another, for both backends (`pytest` from backend/).
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+from knowledge_base import config
+from knowledge_base.warmup import WarmupState
+
+COLLECTIONS = ("factcheck", "legal")
+
+
+@contextmanager
+def _single_threaded_torch():
+    """Keep torch from starting its intra-op (OpenMP) thread pool.
+
+    A worker forked after the master has started that pool can hang in its
+    first parallel op; with one thread, no pool is started.
+    """
+    try:
+        import torch
+    except ImportError:
+        yield
+        return
+    threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(threads)
+
+
+@contextmanager
+def _own_children():
+    """Reap our own children: gunicorn's master installs a SIGCHLD handler
+    that would reap them first (as if they were workers)."""
+    previous = signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGCHLD, previous)
+
+
+def _fork(fn: Callable[[], None]) -> int:
+    """Run `fn` in a forked child; its exit code is 0 if `fn` succeeded."""
+    from knowledge_base.vector_store import reset_after_fork
+
+    sys.stdout.flush()
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            reset_after_fork()
+            fn()
+            code = 0
+        except BaseException as e:
+            print(f"Pre-fork child {os.getpid()} failed: {e}")
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+    return pid
+
+
+def _wait(pids: List[int], timeout: float) -> Dict[int, int]:
+    """Wait for children; returns their exit codes (-9 for killed on timeout)."""
+    codes = {}
+    deadline = time.monotonic() + timeout
+    while len(codes) < len(pids):
+        for pid in pids:
+            if pid in codes:
+                continue
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                codes[pid] = os.waitstatus_to_exitcode(status)
+            elif time.monotonic() > deadline:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                codes[pid] = -signal.SIGKILL
+        time.sleep(0.05)
+    return codes
+
+
+def preload(timeout: float = 600.0) -> Dict[str, float]:
+    """Load shared state in the pre-fork master; returns phase timings (ms).
+
+    Never opens a Chroma client in this process.
+    """
+    from knowledge_base.vector_store import (
+        assert_fork_safe,
+        get_embedding_function,
+        init_factcheck_kb,
+        init_legal_kb,
+    )
+
+    state = WarmupState()
+    init = {"factcheck": init_factcheck_kb, "legal": init_legal_kb}
+    chroma = [name for name in COLLECTIONS if config.collection_backend(name) != "numpy"]
+
+    with _single_threaded_torch():
+        # ONNX sessions and embedding-service sockets are per process, so
+        # only the sentence-transformers weights are worth sharing
+        if config.EMBEDDING_BACKEND != "onnx" and not config.EMBEDDING_SERVICE_SOCKET:
+            state.run_phase("embedding_model", get_embedding_function)
+        for name in COLLECTIONS:
+            if name not in chroma:
+                state.run_phase(f"{name}_kb", init[name])
+        if chroma:
+            def sync_chroma():
+                with _own_children():
+                    pid = _fork(lambda: [init[name]() for name in chroma])
+                    code = _wait([pid], timeout)[pid]
+                if code != 0:
+                    raise RuntimeError(f"Syncing Chroma collections {chroma} failed")
+            state.run_phase("chroma_sync", sync_chroma)
+
+    assert_fork_safe()
+    return dict(state.phases)
+
+
+def check(workers: int = 2, timeout: float = 300.0) -> bool:
+    """Preload as the master would, then fork `workers` children that each
+    warm up and search both knowledge bases concurrently."""
+    from knowledge_base.vector_store import init_factcheck_kb, init_legal_kb
+    from knowledge_base.warmup import warm_up
+
+    preload(timeout)
+
+    def worker():
+        status = warm_up()
+        if not status["ready"]:
+            raise RuntimeError(status["error"])
+        for kb in (init_factcheck_kb(), init_legal_kb()):
+            if not kb.search("building height limit", top_k=3):
+                raise RuntimeError(f"{kb.collection_name} search returned no results")
+        print(f"Pre-fork child {os.getpid()} searched both KBs")
+
+    pids = [_fork(worker) for _ in range(max(1, workers))]
+    codes = _wait(pids, timeout)
+    failed = [pid for pid, code in codes.items() if code != 0]
+    for pid in failed:
+        print(f"Pre-fork child {pid} exited with {codes[pid]}")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork loading for the KB workers")
+    parser.add_argument("--check", action="store_true", help="fork test workers and search in each")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    if args.check:
+        ok = check(args.workers, args.timeout)
+        print("Pre-fork check passed" if ok else "Pre-fork check FAILED")
+        sys.exit(0 if ok else 1)
+    print(f"Pre-fork load timings (ms): {preload(args.timeout)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Cross-encoder reranking of first-stage search hits.
+
+A bi-encoder ranks by comparing independently computed vectors; a
+cross-encoder reads query and document together and is noticeably better at
+ordering the top few hits. It is too slow to score a whole corpus, so it only
+rescores the candidates returned by dense/lexical/hybrid search, in one
+batched forward pass. Scores are cached per (query, document), and a request
+whose rerank misses its latency budget keeps the first-stage order.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Any, Dict, List
+
+from knowledge_base import config
+from knowledge_base.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Scoring jobs that may be queued or running at once; beyond this, requests
+# skip reranking instead of piling more work behind a slow model
+MAX_PENDING_JOBS = 4
+
+
+class Reranker:
+    """Rescores search hits with a sentence-transformers CrossEncoder.
+
+    The model is loaded on first use. Scoring runs on a dedicated thread so
+    the caller can stop waiting when the budget runs out; the job still
+    finishes in the background and fills the score cache for the next request.
+    """
+
+    def __init__(self, model_name: str, budget_ms: float, cache: LRUCache):
+        self.model_name = model_name
+        self.budget = max(0.0, budget_ms) / 1000.0
+        self.score_cache = cache
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kb-rerank")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._reranked = 0
+        self._fallbacks = 0
+        self._skipped = 0
+        self._errors = 0
+        self._total_ms = 0.0
+
+    def _get_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def _score(self, pairs: List[List[str]], keys: List[tuple]) -> List[float]:
+        try:
+            scores = self._get_model().predict(
+                pairs, batch_size=len(pairs), show_progress_bar=False, convert_to_numpy=True
+            )
+            scores = [float(score) for score in scores]
+            for key, score in zip(keys, scores):
+                self.score_cache.put(key, score)
+            return scores
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def rerank_many(
+        self,
+        queries: List[str],
+        hits_per_query: List[List[Dict[str, Any]]],
+        top_k: int,
+        query_keys: List[tuple],
+    ) -> List[List[Dict[str, Any]]]:
+        """Reorder each query's hits by cross-encoder score and keep `top_k`.
+
+        `query_keys` identify each query in the score cache (together with the
+        doc id), e.g. (collection, corpus version, normalized query). Reranked
+        hits carry the cross-encoder score; on timeout or error the hits keep
+        their first-stage order and scores.
+        """
+        started = time.perf_counter()
+        scores = [
+            [self.score_cache.get(query_key + (hit["doc_id"],)) for hit in hits]
+            for query_key, hits in zip(query_keys, hits_per_query)
+        ]
+        missing = [
+            (q, i)
+            for q, row in enumerate(scores)
+            for i, score in enumerate(row)
+            if score is None
+        ]
+
+        if missing:
+            with self._lock:
+                if self._pending >= MAX_PENDING_JOBS:
+                    self._skipped += 1
+                    return [hits[:top_k] for hits in hits_per_query]
+                self._pending += 1
+            future = self._pool.submit(
+                self._score,
+                [[queries[q], hits_per_query[q][i]["content"]] for q, i in missing],
+                [query_keys[q] + (hits_per_query[q][i]["doc_id"],) for q, i in missing],
+            )
+            try:
+                fresh = future.result(timeout=max(0.0, self.budget - (time.perf_counter() - started)))
+            except FuturesTimeoutError:
+                with self._lock:
+                    self._fallbacks += 1
+                return [hits[:top_k] for hits in hits_per_query]
+            except Exception as e:
+                logger.warning("Reranking failed, keeping first-stage order: %s", e)
+                with self._lock:
+                    self._errors += 1
+                return [hits[:top_k] for hits in hits_per_query]
+            for (q, i), score in zip(missing, fresh):
+                scores[q][i] = score
+
+        reranked = []
+        for hits, row in zip(hits_per_query, scores):
+            order = sorted(range(len(hits)), key=lambda i: -row[i])
+            reranked.append([dict(hits[i], score=row[i]) for i in order[:top_k]])
+
+        with self._lock:
+            self._reranked += 1
+            self._total_ms += 1000 * (time.perf_counter() - started)
+        return reranked
+
+    def stats(self) -> Dict[str, Any]:
+        """Return rerank counters, average latency (ms) and score-cache stats."""
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "budget_ms": self.budget * 1000,
+                "reranked": self._reranked,
+                "fallbacks": self._fallbacks,
+                "skipped": self._skipped,
+                "errors": self._errors,
+                "pending": self._pending,
+                "avg_rerank_ms": round(self._total_ms / self._reranked, 3) if self._reranked else 0.0,
+                "score_cache": self.score_cache.stats(),
+            }
+
+
+reranker = Reranker(
+    model_name=config.RERANK_MODEL,
+    budget_ms=config.RERANK_BUDGET_MS,
+    cache=LRUCache(
+        max_entries=config.RERANK_CACHE_MAX_ENTRIES,
+        ttl_seconds=config.RERANK_CACHE_TTL_SECONDS,
+    ),
+)
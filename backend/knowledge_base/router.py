@@ -1,13 +1,123 @@
 """
 API routes for knowledge base search endpoints.
 """
-from fastapi import APIRouter, HTTPException
-from db.models import SearchRequest, SearchResponse, SearchResult
-from knowledge_base.vector_store import init_factcheck_kb, init_legal_kb
+from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Dict, Any
+from db.models import (
+    SearchRequest,
+    SearchResponse,
+    SearchResult,
+    BatchSearchRequest,
+    BatchSearchResponse,
+    ExpandedSearchRequest,
+    ExpandedSearchResponse,
+    DocumentsRequest,
+    DocumentsResponse,
+)
+from knowledge_base.vector_store import (
+    hnsw_params,
+    init_factcheck_kb,
+    init_legal_kb,
+    sync_factcheck_kb,
+    sync_legal_kb,
+    get_cache_stats,
+    expansion_queries,
+)
+from auth.admin import require_admin_key
+from knowledge_base.executor import search_executor, SearchOverloadedError
 
 router = APIRouter()
 
 
+async def _offload(fn, *args):
+    """Run blocking KB work on the search pool; a full queue becomes a 503."""
+    try:
+        return await search_executor.run(fn, *args)
+    except SearchOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+def _run_search(kb, request: SearchRequest, expand_related: bool = False) -> List[Dict[str, Any]]:
+    """Run a single search, adding snippets/related clauses and dropping
+    content as requested."""
+    results = kb.search(request.query, request.top_k, request.mode, request.filters, request.rerank)
+    if request.snippet:
+        results = kb.add_snippets(request.query, results)
+    if expand_related:
+        results = kb.add_related(results)
+    if not request.include_content:
+        results = [dict(r, content=None) for r in results]
+    return results
+
+
+def _run_batch_search(kb, request: BatchSearchRequest) -> List[List[Dict[str, Any]]]:
+    """Run a batched search, adding snippets and dropping content as requested."""
+    results = kb.search_many(request.queries, request.top_k, request.mode, request.filters, request.rerank)
+    if request.snippet:
+        results = [kb.add_snippets(q, r) for q, r in zip(request.queries, results)]
+    if not request.include_content:
+        results = [[dict(hit, content=None) for hit in r] for r in results]
+    return results
+
+
+def _to_search_response(query: str, results: List[Dict[str, Any]]) -> SearchResponse:
+    """Build a SearchResponse from formatted KnowledgeBase results."""
+    return SearchResponse(
+        results=[
+            SearchResult(
+                doc_id=r["doc_id"],
+                content=r["content"],
+                score=r["score"],
+                metadata=r["metadata"],
+                snippets=r.get("snippets"),
+                related=r.get("related")
+            )
+            for r in results
+        ],
+        query=query,
+        total_results=len(results)
+    )
+
+
+def _run_expanded_search(kb, request: ExpandedSearchRequest, queries: List[str]) -> List[Dict[str, Any]]:
+    """Run an expanded search, adding snippets (for the original query) and
+    dropping content as requested."""
+    results = kb.search_expanded(queries, request.top_k, request.mode, request.filters, request.rerank)
+    if request.snippet:
+        results = kb.add_snippets(queries[0], results)
+    if not request.include_content:
+        results = [dict(r, content=None) for r in results]
+    return results
+
+
+def _to_expanded_response(queries: List[str], results: List[Dict[str, Any]]) -> ExpandedSearchResponse:
+    """Build an ExpandedSearchResponse; queries[0] is the original query."""
+    response = _to_search_response(queries[0], results)
+    return ExpandedSearchResponse(
+        results=response.results,
+        query=queries[0],
+        variants=queries[1:],
+        total_results=response.total_results
+    )
+
+
+def _to_documents_response(doc_ids: List[str], documents: List[Dict[str, Any]]) -> DocumentsResponse:
+    """Build a DocumentsResponse, listing the requested ids that were not found."""
+    found = {doc["doc_id"] for doc in documents}
+    return DocumentsResponse(
+        documents=documents,
+        missing=[doc_id for doc_id in dict.fromkeys(doc_ids) if doc_id not in found]
+    )
+
+
+def _to_batch_response(queries: List[str], results: List[List[Dict[str, Any]]]) -> BatchSearchResponse:
+    """Build a BatchSearchResponse from per-query KnowledgeBase results."""
+    return BatchSearchResponse(
+        responses=[_to_search_response(q, r) for q, r in zip(queries, results)],
+        total_queries=len(queries)
+    )
+
+
 @router.post("/factcheck/search", response_model=SearchResponse)
 async def search_factcheck(request: SearchRequest):
     """
@@ -17,22 +127,11 @@ async def search_factcheck(request: SearchRequest):
     for verifying claims.
     """
     try:
-        kb = init_factcheck_kb()
-        results = kb.search(request.query, request.top_k)
+        results = await _offload(lambda: _run_search(init_factcheck_kb(), request))
         
-        return SearchResponse(
-            results=[
-                SearchResult(
-                    doc_id=r["doc_id"],
-                    content=r["content"],
-                    score=r["score"],
-                    metadata=r["metadata"]
-                )
-                for r in results
-            ],
-            query=request.query,
-            total_results=len(results)
-        )
+        return _to_search_response(request.query, results)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
 
@@ -43,25 +142,89 @@ async def search_legal(request: SearchRequest):
     Search the legal knowledge base (Alphaville Zoning Code).
     
     This endpoint is used by participants to retrieve relevant clauses
-    for answering zoning law questions.
+    for answering zoning law questions. With expand_related, each clause comes
+    back with the clauses that conflict with, qualify or reference it.
     """
     try:
-        kb = init_legal_kb()
-        results = kb.search(request.query, request.top_k)
-        
-        return SearchResponse(
-            results=[
-                SearchResult(
-                    doc_id=r["doc_id"],
-                    content=r["content"],
-                    score=r["score"],
-                    metadata=r["metadata"]
-                )
-                for r in results
-            ],
-            query=request.query,
-            total_results=len(results)
+        results = await _offload(
+            lambda: _run_search(init_legal_kb(), request, expand_related=request.expand_related)
         )
+        
+        return _to_search_response(request.query, results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+
+@router.post("/factcheck/search/batch", response_model=BatchSearchResponse)
+async def search_factcheck_batch(request: BatchSearchRequest):
+    """
+    Search the fact-checking knowledge base with several queries at once.
+    
+    All queries are embedded and looked up in a single batched call, which is
+    much cheaper than one /search request per query reformulation.
+    """
+    try:
+        results = await _offload(lambda: _run_batch_search(init_factcheck_kb(), request))
+        return _to_batch_response(request.queries, results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+
+@router.post("/legal/search/batch", response_model=BatchSearchResponse)
+async def search_legal_batch(request: BatchSearchRequest):
+    """
+    Search the legal knowledge base with several queries at once.
+    
+    All queries are embedded and looked up in a single batched call, which is
+    much cheaper than one /search request per query reformulation.
+    """
+    try:
+        results = await _offload(lambda: _run_batch_search(init_legal_kb(), request))
+        return _to_batch_response(request.queries, results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+
+@router.post("/factcheck/search/expanded", response_model=ExpandedSearchResponse)
+async def search_factcheck_expanded(request: ExpandedSearchRequest):
+    """
+    Search the fact-checking knowledge base with a claim and its reformulations.
+    
+    All formulations are embedded and looked up together and their rankings
+    are fused with RRF (one entry per doc_id), replacing several /search
+    round trips per claim.
+    """
+    try:
+        queries = expansion_queries(request.query, request.variants)
+        results = await _offload(lambda: _run_expanded_search(init_factcheck_kb(), request, queries))
+        return _to_expanded_response(queries, results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+
+@router.post("/legal/search/expanded", response_model=ExpandedSearchResponse)
+async def search_legal_expanded(request: ExpandedSearchRequest):
+    """
+    Search the legal knowledge base with a question and its reformulations.
+    
+    All formulations are embedded and looked up together and their rankings
+    are fused with RRF (one entry per doc_id), replacing several /search
+    round trips per question.
+    """
+    try:
+        queries = expansion_queries(request.query, request.variants)
+        results = await _offload(lambda: _run_expanded_search(init_legal_kb(), request, queries))
+        return _to_expanded_response(queries, results)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
 
@@ -69,8 +232,7 @@ async def search_legal(request: SearchRequest):
 @router.get("/factcheck/document/{doc_id}")
 async def get_factcheck_document(doc_id: str):
     """Get a specific document from the fact-checking KB."""
-    kb = init_factcheck_kb()
-    doc = kb.get_document(doc_id)
+    doc = await _offload(lambda: init_factcheck_kb().get_document(doc_id))
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     return doc
@@ -79,31 +241,101 @@ async def get_factcheck_document(doc_id: str):
 @router.get("/legal/document/{doc_id}")
 async def get_legal_document(doc_id: str):
     """Get a specific clause from the legal KB."""
-    kb = init_legal_kb()
-    doc = kb.get_document(doc_id)
+    doc = await _offload(lambda: init_legal_kb().get_document(doc_id))
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     return doc
 
 
+@router.post("/factcheck/documents", response_model=DocumentsResponse)
+async def get_factcheck_documents(request: DocumentsRequest):
+    """
+    Get several documents from the fact-checking KB in one call.
+    
+    Use this to resolve all retrieved ids at once instead of one
+    /document/{doc_id} request per id.
+    """
+    documents = await _offload(lambda: init_factcheck_kb().get_documents(request.doc_ids))
+    return _to_documents_response(request.doc_ids, documents)
+
+
+@router.post("/legal/documents", response_model=DocumentsResponse)
+async def get_legal_documents(request: DocumentsRequest):
+    """
+    Get several clauses from the legal KB in one call.
+    
+    Use this to resolve all retrieved ids at once instead of one
+    /document/{doc_id} request per id.
+    """
+    documents = await _offload(lambda: init_legal_kb().get_documents(request.doc_ids))
+    return _to_documents_response(request.doc_ids, documents)
+
+
 @router.get("/factcheck/stats")
 async def get_factcheck_stats():
     """Get statistics about the fact-checking knowledge base."""
-    kb = init_factcheck_kb()
+    kb = await _offload(init_factcheck_kb)
     return {
         "collection": "factcheck",
-        "document_count": kb.count(),
-        "description": "Wikipedia-style articles for fact verification"
+        "backend": kb.backend,
+        "quantization": kb.quantization if kb.backend == "numpy" else None,
+        "vector_bytes": kb.collection.vector_bytes() if kb.backend == "numpy" else None,
+        "hnsw": hnsw_params(kb.collection.metadata) if kb.backend == "chroma" else None,
+        "document_count": await _offload(kb.count),
+        "passage_count": await _offload(kb.passages.count) if kb.passages is not None else None,
+        "description": "Wikipedia-style articles for fact verification",
+        "batching": kb.batch_stats()
     }
 
 
 @router.get("/legal/stats")
 async def get_legal_stats():
     """Get statistics about the legal knowledge base."""
-    kb = init_legal_kb()
+    kb = await _offload(init_legal_kb)
     return {
         "collection": "legal",
-        "document_count": kb.count(),
-        "description": "Alphaville Zoning Code clauses for legal queries"
+        "backend": kb.backend,
+        "quantization": kb.quantization if kb.backend == "numpy" else None,
+        "vector_bytes": kb.collection.vector_bytes() if kb.backend == "numpy" else None,
+        "hnsw": hnsw_params(kb.collection.metadata) if kb.backend == "chroma" else None,
+        "document_count": await _offload(kb.count),
+        "passage_count": await _offload(kb.passages.count) if kb.passages is not None else None,
+        "description": "Alphaville Zoning Code clauses for legal queries",
+        "batching": kb.batch_stats()
     }
 
+
+@router.post("/factcheck/sync", dependencies=[Depends(require_admin_key)])
+async def sync_factcheck():
+    """
+    Re-read the Wikipedia articles and incrementally sync the fact-check KB.
+    
+    Only new or changed articles are re-embedded; removed ids are deleted.
+    Requires the X-Admin-Key header.
+    """
+    summary = await _offload(sync_factcheck_kb)
+    return {"collection": "factcheck", **summary}
+
+
+@router.post("/legal/sync", dependencies=[Depends(require_admin_key)])
+async def sync_legal():
+    """
+    Re-read the zoning code and incrementally sync the legal KB.
+    
+    Only new or changed clauses are re-embedded; removed ids are deleted.
+    Requires the X-Admin-Key header.
+    """
+    summary = await _offload(sync_legal_kb)
+    return {"collection": "legal", **summary}
+
+
+@router.get("/cache/stats")
+async def get_kb_cache_stats():
+    """Get hit/miss/eviction counters for the knowledge base caches."""
+    return get_cache_stats()
+
+
+@router.get("/executor/stats")
+async def get_kb_executor_stats():
+    """Get queue depth, rejections and latency metrics for the search thread pool."""
+    return search_executor.stats()
@@ -0,0 +1,113 @@
+"""
+Sentence-level snippets for search results.
+
+Documents are split into sentences whose embeddings are computed the first
+time a document is returned with snippets (or at ingest, with
+KB_SNIPPET_PRECOMPUTE=on) and kept per document. A search hit can then be reduced to the
+sentences that best match the query, with character offsets into the
+document, without re-encoding anything but the query.
+"""
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from knowledge_base.numpy_store import normalize_rows
+
+# A sentence ends at ., ! or ? followed by whitespace and an upper-case letter,
+# digit or opening quote/bracket. Decimals ("8,848.86") and clause numbers
+# ("4.2.1") have no whitespace after the dot, so they don't split.
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """Return (start, end) character spans of the sentences in `text`."""
+    spans = []
+    start = 0
+    for boundary in _SENTENCE_BOUNDARY.finditer(text):
+        spans.append((start, boundary.start()))
+        start = boundary.end()
+    if text[start:].strip():
+        spans.append((start, len(text.rstrip())))
+    return [(s, e) for s, e in spans if e > s]
+
+
+class SentenceIndex:
+    """Per-document sentence spans and normalized sentence embeddings."""
+
+    def __init__(self, embed: Callable[[List[str]], Any]):
+        self._embed = embed
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[str, List[Tuple[int, int]], np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, documents: List[Dict[str, Any]]) -> None:
+        """Split and embed documents (`id`, `content`), all sentences in one call."""
+        split = [(doc["id"], doc["content"], split_sentences(doc["content"])) for doc in documents]
+        texts = [content[s:e] for _, content, spans in split for s, e in spans]
+        if not texts:
+            return
+        vectors = normalize_rows(self._embed(texts))
+        entries = {}
+        offset = 0
+        for doc_id, content, spans in split:
+            entries[doc_id] = (content, spans, vectors[offset:offset + len(spans)])
+            offset += len(spans)
+        with self._lock:
+            self._entries.update(entries)
+
+    def discard(self, doc_ids: List[str]) -> None:
+        """Forget documents that were removed from the collection."""
+        with self._lock:
+            for doc_id in doc_ids:
+                self._entries.pop(doc_id, None)
+
+    def _lookup(self, hits: List[Dict[str, Any]]):
+        """Entries for the hits, embedding documents not seen (or changed) yet."""
+        with self._lock:
+            entries = {hit["doc_id"]: self._entries.get(hit["doc_id"]) for hit in hits}
+        stale = {
+            hit["doc_id"]: hit for hit in hits
+            if entries[hit["doc_id"]] is None or entries[hit["doc_id"]][0] != hit["content"]
+        }
+        if stale:
+            self.add([{"id": doc_id, "content": hit["content"]} for doc_id, hit in stale.items()])
+            with self._lock:
+                entries.update({doc_id: self._entries.get(doc_id) for doc_id in stale})
+        return entries
+
+    def snippets(
+        self,
+        query_vector,
+        hits: List[Dict[str, Any]],
+        max_sentences: int = 2,
+    ) -> List[Dict[str, Any]]:
+        """Return copies of `hits` with the best-matching sentences attached.
+
+        Each hit gets `snippets`: up to `max_sentences` sentences as
+        {"text", "start", "end", "score"}, in document order.
+        """
+        query = normalize_rows(query_vector)[0]
+        entries = self._lookup(hits)
+        out = []
+        for hit in hits:
+            entry: Optional[tuple] = entries.get(hit["doc_id"])
+            snippets = []
+            if entry is not None and len(entry[1]):
+                content, spans, vectors = entry
+                scores = vectors @ query
+                best = sorted(np.argsort(-scores, kind="stable")[:max(1, max_sentences)])
+                snippets = [
+                    {
+                        "text": content[spans[i][0]:spans[i][1]],
+                        "start": spans[i][0],
+                        "end": spans[i][1],
+                        "score": float(scores[i]),
+                    }
+                    for i in best
+                ]
+            out.append(dict(hit, snippets=snippets))
+        return out
@@ -1,124 +1,1065 @@
 """
 Vector store setup using ChromaDB for the knowledge bases.
+
+chromadb and the embedding model are heavy to import and construct, so both
+are created on first use rather than at import time.
 """
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
+import fcntl
+import hashlib
+import itertools
+import json
 import os
-from typing import List, Dict, Any
+import tempfile
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import List, Dict, Any, Callable
+
+import numpy as np
+
+from knowledge_base import config
+from knowledge_base.batching import MicroBatcher
+from knowledge_base.cache import LRUCache
+from knowledge_base.chunking import split_into_passages
+from knowledge_base.clause_graph import ClauseGraph
+from knowledge_base.embedding_store import (
+    load_corpus_embeddings,
+    find_corpus_embeddings,
+    load_index_artifact,
+    corpus_hash,
+)
+from knowledge_base.lexical_index import BM25Index, reciprocal_rank_fusion, lexical_variants
+from knowledge_base.metadata_index import MetadataIndex, chroma_where, filter_key, validate_filters
+from knowledge_base.numpy_store import NumpyCollection
+from knowledge_base.rerank import reranker
+from knowledge_base.snippets import SentenceIndex
 
 # Use sentence-transformers for embeddings
-EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_MODEL = config.EMBEDDING_MODEL
+
+CHROMA_PATH = "./chroma_db"
+
+_chroma_client = None
+_chroma_client_pid = None
+_embedding_function = None
+_lazy_init_lock = threading.Lock()
+
+
+def get_chroma_client():
+    """Return the ChromaDB client (persistent storage, telemetry disabled),
+    creating it on first use.
+    
+    The client's SQLite connections and threads don't survive a fork, so a
+    client inherited from a parent process is refused rather than reused.
+    """
+    global _chroma_client, _chroma_client_pid
+    if _chroma_client is not None and _chroma_client_pid != os.getpid():
+        raise RuntimeError(
+            f"ChromaDB client was opened in process {_chroma_client_pid} before a fork; "
+            "call reset_after_fork() in the child before using the knowledge bases"
+        )
+    if _chroma_client is None:
+        with _lazy_init_lock:
+            if _chroma_client is None:
+                import chromadb
+                from chromadb.config import Settings
+                _chroma_client = chromadb.PersistentClient(
+                    path=CHROMA_PATH,
+                    settings=Settings(anonymized_telemetry=False)
+                )
+                _chroma_client_pid = os.getpid()
+    return _chroma_client
 
-# ChromaDB client (persistent storage, telemetry disabled)
-chroma_client = chromadb.PersistentClient(
-    path="./chroma_db",
-    settings=Settings(anonymized_telemetry=False)
+
+@contextmanager
+def chroma_process_lock():
+    """Serialize Chroma creation and syncs across processes.
+    
+    Several workers starting on a fresh chroma_db would otherwise all create
+    its tables and write the same collections at once. The lock is an flock
+    on a file in CHROMA_PATH; it is not re-entrant, so never nest it.
+    """
+    os.makedirs(CHROMA_PATH, exist_ok=True)
+    with open(os.path.join(CHROMA_PATH, ".kb-sync.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _sync_lock(backend: str):
+    return chroma_process_lock() if backend == "chroma" else nullcontext()
+
+
+def reopen_chroma_client():
+    """Make the next get_chroma_client() call open a new Chroma system.
+    
+    Chroma shares one system per path within a process, and that system's
+    HNSW segments only see writes made through it. A new system loads them
+    from disk and replays the write log, so it sees what other processes
+    wrote. Collections opened on the old system keep working on it until
+    they are dropped.
+    """
+    global _chroma_client, _chroma_client_pid
+    with _lazy_init_lock:
+        if _chroma_client is not None:
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+        _chroma_client = None
+        _chroma_client_pid = None
+
+
+def assert_fork_safe():
+    """Raise if this process holds state that must not be inherited by a fork.
+    
+    Called in a pre-fork server's master before each worker is forked.
+    """
+    if _chroma_client is not None:
+        raise RuntimeError(
+            "ChromaDB client is open in the pre-fork master; only NumPy-backed "
+            "knowledge bases may be loaded before forking"
+        )
+
+
+def create_embedding_function():
+    """Create the embedding function for the configured embedding backend.
+    
+    With KB_EMBEDDING_SERVICE_SOCKET set, texts are embedded by the shared
+    embedding service and this process never loads the model.
+    """
+    if config.EMBEDDING_SERVICE_SOCKET:
+        from knowledge_base.embedding_service import RemoteEmbeddingFunction
+        return RemoteEmbeddingFunction(
+            config.EMBEDDING_SERVICE_SOCKET, timeout=config.EMBEDDING_SERVICE_TIMEOUT
+        )
+    return create_local_embedding_function()
+
+
+def create_local_embedding_function():
+    """Create an in-process embedding function for the configured backend."""
+    if config.EMBEDDING_BACKEND == "onnx":
+        from knowledge_base.onnx_embedding import OnnxEmbeddingFunction
+        return OnnxEmbeddingFunction(config.ONNX_MODEL_DIR, num_threads=config.ONNX_NUM_THREADS)
+    from chromadb.utils import embedding_functions
+    return embedding_functions.SentenceTransformerEmbeddingFunction(
+        model_name=EMBEDDING_MODEL
+    )
+
+
+def get_embedding_function():
+    """Return the embedding function, loading the model on first use."""
+    global _embedding_function
+    if _embedding_function is None:
+        with _lazy_init_lock:
+            if _embedding_function is None:
+                _embedding_function = create_embedding_function()
+    return _embedding_function
+
+
+class LazyEmbeddingFunction:
+    """Chroma-compatible embedding function that loads the model on first call.
+    
+    Collections can be created (and filled from precomputed vectors) without
+    ever loading the model.
+    """
+    
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return get_embedding_function()(input)
+
+
+# Embedding function (int8 ONNX vectors stay compatible with collections and
+# persisted matrices built by sentence-transformers, so both share the same
+# model key)
+embedding_function = LazyEmbeddingFunction()
+
+
+# Query embeddings keyed by normalized query text. Agents re-send the same
+# claims/questions on every evaluation run, so most query encodes are repeats.
+query_embedding_cache = LRUCache(
+    max_entries=config.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+    max_bytes=int(config.QUERY_EMBEDDING_CACHE_MAX_MB * 1024 * 1024),
+    ttl_seconds=config.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+    size_of=lambda vector: vector.nbytes + 200,  # vector + key/bookkeeping overhead
 )
 
-# Embedding function
-sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name=EMBEDDING_MODEL
+
+# Full search results keyed by (collection, corpus version, mode, query, top_k).
+# The corpus version changes on every ingest, so entries cached before a
+# reindex can never be served afterwards.
+search_result_cache = LRUCache(
+    max_entries=config.SEARCH_RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=int(config.SEARCH_RESULT_CACHE_MAX_MB * 1024 * 1024),
+    ttl_seconds=config.SEARCH_RESULT_CACHE_TTL_SECONDS,
+    size_of=lambda hits: sum(len(hit["content"]) + 300 for hit in hits) + 100,
 )
 
+# Process-wide source of corpus versions, so versions are never reused even if
+# a KnowledgeBase is re-created for the same collection.
+_corpus_versions = itertools.count(1)
 
-def get_or_create_collection(name: str):
-    """Get or create a ChromaDB collection."""
-    return chroma_client.get_or_create_collection(
+
+def normalize_query(query: str) -> str:
+    """Normalize query text for cache keys (whitespace and case).
+    
+    Lower-casing is safe because the MiniLM tokenizer is uncased, so both forms
+    produce the same embedding.
+    """
+    return " ".join(query.split()).lower()
+
+
+def embed_queries(queries: List[str]) -> List[List[float]]:
+    """Embed queries, serving repeats from the query-embedding cache.
+    
+    Cache misses are encoded together in a single embedding-function call.
+    """
+    keys = [normalize_query(q) for q in queries]
+    vectors = [query_embedding_cache.get(key) for key in keys]
+    
+    missing = sorted({key for key, vector in zip(keys, vectors) if vector is None})
+    if missing:
+        encoded = dict(zip(missing, embedding_function(missing)))
+        for key, embedding in encoded.items():
+            query_embedding_cache.put(key, np.asarray(embedding, dtype=np.float32))
+        vectors = [
+            vector if vector is not None else np.asarray(encoded[key], dtype=np.float32)
+            for key, vector in zip(keys, vectors)
+        ]
+    
+    return [vector.tolist() for vector in vectors]
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Return counters for the knowledge base caches."""
+    return {
+        "query_embedding": query_embedding_cache.stats(),
+        "search_results": search_result_cache.stats(),
+        "rerank": reranker.stats(),
+    }
+
+
+# Metadata keys starting with this prefix are internal (e.g. the content hash
+# used by incremental sync) and are stripped from everything returned to callers
+RESERVED_METADATA_PREFIX = "_"
+CONTENT_HASH_KEY = "_content_hash"
+PARENT_HASH_KEY = "_parent_hash"
+PASSAGE_COLLECTION_SUFFIX = "_passages"
+
+
+def document_hash(doc: Dict[str, Any]) -> str:
+    """Hash a document's content and (public) metadata."""
+    payload = json.dumps(
+        [doc["content"], public_metadata(doc.get("metadata"))], sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def public_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Return metadata without internal (reserved) keys."""
+    if not metadata:
+        return {}
+    return {k: v for k, v in metadata.items() if not k.startswith(RESERVED_METADATA_PREFIX)}
+
+
+def hnsw_params(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """The HNSW entries ("hnsw:*") of Chroma collection metadata."""
+    return {key: value for key, value in (metadata or {}).items() if key.startswith("hnsw:")}
+
+
+def get_or_create_collection(name: str, hnsw: Dict[str, int] = None, client=None):
+    """Get or create a ChromaDB collection (cosine space) with the given HNSW
+    parameters (e.g. {"hnsw:M": 32}).
+    
+    Chroma fixes a collection's HNSW parameters when the collection is
+    created, so a collection built with other parameters is dropped and
+    recreated empty; the next sync refills it, normally from precomputed
+    vectors.
+    """
+    client = client or get_chroma_client()
+    metadata = {"hnsw:space": "cosine", **(hnsw or {})}
+    try:
+        existing = client.get_collection(name, embedding_function=embedding_function).metadata
+    except ValueError:
+        existing = None
+    if existing is not None and hnsw_params(existing) != metadata:
+        print(f"HNSW parameters of {name} changed ({hnsw_params(existing)} -> {metadata}), rebuilding it")
+        client.delete_collection(name)
+    return client.get_or_create_collection(
         name=name,
-        embedding_function=sentence_transformer_ef,
-        metadata={"hnsw:space": "cosine"}
+        embedding_function=embedding_function,
+        metadata=metadata
     )
 
 
+def create_collection(
+    name: str,
+    backend: str,
+    quantization: str = "none",
+    hnsw: Dict[str, int] = None,
+    chroma_client=None,
+):
+    """Create the collection for a knowledge base on the given backend.
+    
+    `quantization` ("none" or "int8") only applies to the numpy backend,
+    `hnsw` (Chroma HNSW metadata) and `chroma_client` (default: the shared
+    persistent client) only to the chroma backend.
+    """
+    if backend == "numpy":
+        return NumpyCollection(
+            name,
+            embedding_function=embedding_function,
+            quantization=quantization,
+            rescore_multiplier=config.RESCORE_MULTIPLIER,
+        )
+    return get_or_create_collection(name, hnsw, client=chroma_client)
+
+
 class KnowledgeBase:
     """Base class for knowledge bases."""
     
-    def __init__(self, collection_name: str):
-        self.collection = get_or_create_collection(collection_name)
+    def __init__(self, collection_name: str, backend: str = None, chroma_client=None):
+        self.backend = backend or config.collection_backend(collection_name)
+        self.quantization = config.collection_quantization(collection_name)
+        self.hnsw = config.collection_hnsw(collection_name)
+        self.collection = create_collection(
+            collection_name, self.backend, self.quantization, self.hnsw, chroma_client
+        )
         self.collection_name = collection_name
+        self.chunking = config.collection_chunking(collection_name)
+        self.passages = None
+        if self.chunking:
+            self.passages = create_collection(
+                collection_name + PASSAGE_COLLECTION_SUFFIX,
+                self.backend, self.quantization, self.hnsw, chroma_client,
+            )
+        self.version = next(_corpus_versions)
+        self.sync_stamp = read_sync_stamp(collection_name)
+        self.sentences = SentenceIndex(embedding_function)
+        self._lexical_index = None
+        self._lexical_version = None
+        self._lexical_lock = threading.Lock()
+        self._metadata_indexes = {}
+        self._clause_graph = None
+        self._clause_graph_version = None
+        self._clause_graph_lock = threading.Lock()
+        self._metadata_lock = threading.Lock()
+        self._ingest_lock = threading.Lock()
+        self._batcher = None
+        if config.BATCH_WINDOW_MS > 0 and config.BATCH_MAX_SIZE > 1:
+            self._batcher = MicroBatcher(
+                self._search_batch, config.BATCH_WINDOW_MS, config.BATCH_MAX_SIZE
+            )
+    
+    def _bump_version(self):
+        """Mark the corpus as changed so cached search results are not reused."""
+        self.version = next(_corpus_versions)
+    
+    def is_stale(self) -> bool:
+        """Whether another process has synced this collection since we loaded it."""
+        return read_sync_stamp(self.collection_name) != self.sync_stamp
+    
+    def _stored_metadatas(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Document metadata plus the content hash used by incremental sync."""
+        return [
+            {**public_metadata(doc.get("metadata")), CONTENT_HASH_KEY: document_hash(doc)}
+            for doc in documents
+        ]
+    
+    def _backend_embeddings(self, embeddings):
+        """Convert an embedding matrix to what the collection backend accepts."""
+        if embeddings is None or self.backend == "numpy":
+            return embeddings
+        return np.asarray(embeddings).tolist()
     
-    def add_documents(self, documents: List[Dict[str, Any]]):
-        """Add documents to the collection."""
+    def add_documents(self, documents: List[Dict[str, Any]], embeddings=None):
+        """Add documents to the collection.
+        
+        `embeddings` (one row per document) skips encoding the documents; the
+        NumPy backend keeps a float32 matrix as-is (e.g. memory-mapped).
+        """
         ids = [doc["id"] for doc in documents]
         contents = [doc["content"] for doc in documents]
-        metadatas = [doc.get("metadata", {}) for doc in documents]
         
-        self.collection.add(
-            ids=ids,
-            documents=contents,
-            metadatas=metadatas
+        with self._ingest_lock:
+            self.collection.add(
+                ids=ids,
+                documents=contents,
+                metadatas=self._stored_metadatas(documents),
+                embeddings=self._backend_embeddings(embeddings)
+            )
+            if config.SNIPPET_PRECOMPUTE:
+                self.sentences.add(documents)
+            self._bump_version()
+    
+    def sync_documents(
+        self,
+        documents: List[Dict[str, Any]],
+        embeddings_for: Callable[[List[int]], Any] = None,
+    ) -> Dict[str, int]:
+        """Incrementally bring the collection in line with `documents`.
+        
+        Each stored document carries a hash of its content and metadata. Only
+        new or changed documents are upserted (and therefore embedded), and
+        ids that are no longer present are deleted. `embeddings_for(rows)` may
+        supply vectors for the given document indices instead of encoding them.
+        Returns counts of added/updated/deleted/unchanged documents.
+        """
+        with self._ingest_lock:
+            stored = self.collection.get(include=["metadatas"])
+            stored_hashes = {
+                doc_id: (stored["metadatas"][i] or {}).get(CONTENT_HASH_KEY) if stored["metadatas"] else None
+                for i, doc_id in enumerate(stored["ids"])
+            }
+            
+            wanted_ids = {doc["id"] for doc in documents}
+            rows = [
+                i for i, doc in enumerate(documents)
+                if stored_hashes.get(doc["id"]) != document_hash(doc)
+            ]
+            removed = [doc_id for doc_id in stored_hashes if doc_id not in wanted_ids]
+            added = sum(1 for i in rows if documents[i]["id"] not in stored_hashes)
+            
+            known_vectors = {}
+            if rows:
+                changed = [documents[i] for i in rows]
+                embeddings = embeddings_for(rows) if embeddings_for is not None else None
+                if embeddings is not None:
+                    known_vectors = {doc["id"]: embeddings[j] for j, doc in enumerate(changed)}
+                self.collection.upsert(
+                    ids=[doc["id"] for doc in changed],
+                    documents=[doc["content"] for doc in changed],
+                    metadatas=self._stored_metadatas(changed),
+                    embeddings=self._backend_embeddings(embeddings)
+                )
+                if config.SNIPPET_PRECOMPUTE:
+                    self.sentences.add(changed)
+            if removed:
+                self.collection.delete(ids=removed)
+                self.sentences.discard(removed)
+            passages_changed = False
+            if self.passages is not None:
+                passages_changed = self._sync_passages(documents, known_vectors)
+            if rows or removed or passages_changed:
+                self._bump_version()
+        
+        return {
+            "added": added,
+            "updated": len(rows) - added,
+            "deleted": len(removed),
+            "unchanged": len(documents) - len(rows),
+        }
+    
+    def _sync_passages(self, documents: List[Dict[str, Any]], known_vectors: Dict[str, Any]) -> bool:
+        """Re-chunk documents whose content or chunking settings changed.
+        
+        Each passage stores its parent's hash together with the chunking
+        settings, so only the passages of changed or removed documents are
+        replaced. A passage covering a whole document reuses that document's
+        vector from `known_vectors` instead of being encoded again. Returns
+        True if the passage collection changed.
+        """
+        settings = f"{config.PASSAGE_MAX_WORDS}:{config.PASSAGE_OVERLAP_WORDS}"
+        wanted = {doc["id"]: f"{document_hash(doc)}:{settings}" for doc in documents}
+        
+        stored = self.passages.get(include=["metadatas"])
+        stored_by_parent: Dict[str, List[str]] = {}
+        stored_hash: Dict[str, str] = {}
+        for i, passage_id in enumerate(stored["ids"]):
+            metadata = stored["metadatas"][i] or {}
+            parent_id = metadata.get("parent_id")
+            stored_by_parent.setdefault(parent_id, []).append(passage_id)
+            stored_hash[parent_id] = metadata.get(PARENT_HASH_KEY)
+        
+        stale = [parent_id for parent_id in stored_by_parent if stored_hash.get(parent_id) != wanted.get(parent_id)]
+        rechunk = [doc for doc in documents if stored_hash.get(doc["id"]) != wanted[doc["id"]]]
+        
+        stale_ids = [passage_id for parent_id in stale for passage_id in stored_by_parent[parent_id]]
+        if stale_ids:
+            self.passages.delete(ids=stale_ids)
+        
+        passages = []
+        parents_content = {doc["id"]: doc["content"] for doc in rechunk}
+        for doc in rechunk:
+            for passage in split_into_passages(doc, config.PASSAGE_MAX_WORDS, config.PASSAGE_OVERLAP_WORDS):
+                passage["metadata"] = {
+                    **public_metadata(passage["metadata"]),
+                    PARENT_HASH_KEY: wanted[doc["id"]],
+                }
+                passages.append(passage)
+        if passages:
+            vectors = [
+                known_vectors.get(p["metadata"]["parent_id"]) if p["metadata"]["start_char"] == 0
+                and p["metadata"]["end_char"] == len(parents_content[p["metadata"]["parent_id"]]) else None
+                for p in passages
+            ]
+            to_encode = [i for i, vector in enumerate(vectors) if vector is None]
+            if to_encode:
+                encoded = embedding_function([passages[i]["content"] for i in to_encode])
+                for i, vector in zip(to_encode, encoded):
+                    vectors[i] = vector
+            self.passages.upsert(
+                ids=[p["id"] for p in passages],
+                documents=[p["content"] for p in passages],
+                metadatas=[p["metadata"] for p in passages],
+                embeddings=self._backend_embeddings(
+                    np.asarray([np.asarray(v, dtype=np.float32) for v in vectors])
+                )
+            )
+        
+        return bool(stale_ids or passages)
+    
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        mode: str = "dense",
+        filters: Dict[str, Any] = None,
+        rerank: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Search the knowledge base.
+        
+        `mode` is "dense" (embeddings), "lexical" (BM25) or "hybrid" (both,
+        fused with reciprocal-rank fusion). `filters` restricts the search to
+        documents whose metadata matches, e.g. {"zone": "B"}. With `rerank`,
+        the top candidates are rescored by a cross-encoder. Concurrent
+        unfiltered dense searches are coalesced into micro-batches.
+        """
+        if rerank:
+            candidates = self.search(query, max(top_k, config.RERANK_CANDIDATES), mode, filters)
+            return reranker.rerank_many([query], [candidates], top_k, [self._rerank_key(query)])[0]
+        if mode != "dense" or filters or self._batcher is None:
+            return self.search_many([query], top_k, mode, filters)[0]
+        
+        key = self._result_key(query, top_k, mode)
+        hits = search_result_cache.get(key)
+        if hits is None:
+            hits = self._batcher.submit((query, top_k))
+            search_result_cache.put(key, hits)
+        return [dict(hit) for hit in hits]
+    
+    def _search_batch(self, items: List[tuple]) -> List[List[Dict[str, Any]]]:
+        """Run a micro-batch of (query, top_k) dense searches as one lookup."""
+        n_results = max(top_k for _, top_k in items)
+        fresh = self._dense_search([query for query, _ in items], n_results)
+        return [hits[:top_k] for hits, (_, top_k) in zip(fresh, items)]
+    
+    def _result_key(self, query: str, top_k: int, mode: str, filters: Dict[str, Any] = None) -> tuple:
+        """Search-result cache key; includes the corpus version."""
+        return (self.collection_name, self.version, mode, normalize_query(query), top_k, filter_key(filters))
+    
+    def _rerank_key(self, query: str) -> tuple:
+        """Rerank score-cache key prefix (the doc id is appended per hit)."""
+        return (self.collection_name, self.version, normalize_query(query))
+    
+    def batch_stats(self) -> Dict[str, Any]:
+        """Micro-batching metrics (None when coalescing is disabled)."""
+        return self._batcher.stats() if self._batcher is not None else None
+    
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        mode: str = "dense",
+        filters: Dict[str, Any] = None,
+        rerank: bool = False,
+    ) -> List[List[Dict[str, Any]]]:
+        """Search the knowledge base for several queries in one batched call.
+        
+        All queries are embedded in a single encoder call (cached embeddings are
+        reused) and answered by a single multi-query collection lookup. With
+        `rerank`, all queries' candidates are rescored in one cross-encoder
+        pass. Returns one result list per query, in the same order as `queries`.
+        """
+        if mode not in config.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        validate_filters(filters)
+        if not queries:
+            return []
+        if rerank:
+            candidates = self.search_many(queries, max(top_k, config.RERANK_CANDIDATES), mode, filters)
+            return reranker.rerank_many(
+                queries, candidates, top_k, [self._rerank_key(q) for q in queries]
+            )
+        
+        keys = [self._result_key(q, top_k, mode, filters) for q in queries]
+        hits_per_query = [search_result_cache.get(key) for key in keys]
+        
+        missing = [i for i, hits in enumerate(hits_per_query) if hits is None]
+        if missing:
+            missing_queries = [queries[i] for i in missing]
+            if mode == "dense":
+                fresh = self._dense_search(missing_queries, top_k, filters)
+            elif mode == "lexical":
+                fresh = self._lexical_search(missing_queries, top_k, filters)
+            else:
+                fresh = self._hybrid_search(missing_queries, top_k, filters)
+            for i, hits in zip(missing, fresh):
+                hits_per_query[i] = hits
+                search_result_cache.put(keys[i], hits)
+        
+        # Hand out copies so callers can't mutate cached entries
+        return [[dict(hit) for hit in hits] for hits in hits_per_query]
+    
+    def _query(
+        self,
+        collection,
+        queries: List[str],
+        n_results: int,
+        include: List[str],
+        filters: Dict[str, Any] = None,
+    ) -> Dict[str, Any]:
+        """Multi-query collection lookup, restricted to metadata-filter matches.
+        
+        Filter candidates come from the metadata index: the NumPy backend scores
+        only those rows, ChromaDB gets the equivalent `where` clause. Either way
+        n_results is capped at the number of candidates.
+        """
+        kwargs = {}
+        if filters:
+            candidates = self.get_metadata_index(collection is self.passages).candidates(filters)
+            if not candidates:
+                return {field: [[] for _ in queries] for field in ["ids"] + include}
+            n_results = min(n_results, len(candidates))
+            if self.backend == "numpy":
+                kwargs["ids"] = sorted(candidates)
+            else:
+                kwargs["where"] = chroma_where(filters)
+        return collection.query(
+            query_embeddings=embed_queries(queries),
+            n_results=n_results,
+            include=include,
+            **kwargs
         )
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search the knowledge base."""
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=top_k,
-            include=["documents", "metadatas", "distances"]
+    def add_snippets(self, query: str, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Attach the sentences of each hit that best match `query`.
+        
+        Adds `snippets` ({"text", "start", "end", "score"} with offsets into
+        the content) to copies of the hits; only the query is encoded.
+        """
+        return self.sentences.snippets(
+            np.asarray(embed_queries([query])), hits, config.SNIPPET_SENTENCES
         )
+    
+    def add_related(self, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Attach the clauses linked to each hit in the clause graph.
         
+        Adds `related` (doc_id, relation, content, metadata) to copies of the
+        hits; all related clauses are fetched with one collection lookup.
+        """
+        graph = self.get_clause_graph()
+        links = [graph.related(hit["doc_id"]) for hit in hits]
+        related_ids = sorted({link["doc_id"] for hit_links in links for link in hit_links})
+        documents = {doc["doc_id"]: doc for doc in self.get_documents(related_ids)} if related_ids else {}
+        return [
+            dict(hit, related=[
+                {**documents[link["doc_id"]], "relation": link["relation"]}
+                for link in hit_links
+                if link["doc_id"] in documents
+            ])
+            for hit, hit_links in zip(hits, links)
+        ]
+    
+    def search_expanded(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        mode: str = "dense",
+        filters: Dict[str, Any] = None,
+        rerank: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Search with several formulations of one query and fuse the rankings.
+        
+        All formulations go through one batched search_many call; the rankings
+        are fused with reciprocal-rank fusion, so each doc_id appears once.
+        The returned score is the fused RRF score. With `rerank`, the fused
+        candidates are rescored against the first formulation instead.
+        """
+        if rerank:
+            candidates = self.search_expanded(queries, max(top_k, config.RERANK_CANDIDATES), mode, filters)
+            return reranker.rerank_many([queries[0]], [candidates], top_k, [self._rerank_key(queries[0])])[0]
+        n_candidates = top_k * max(1, config.HYBRID_CANDIDATES_MULTIPLIER)
+        rankings = self.search_many(queries, n_candidates, mode, filters)
+        
+        by_id = {}
+        for hits in rankings:
+            for hit in hits:
+                by_id.setdefault(hit["doc_id"], hit)
+        fused = reciprocal_rank_fusion(
+            [[hit["doc_id"] for hit in hits] for hits in rankings], k=config.RRF_K
+        )
+        return [dict(by_id[doc_id], score=score) for doc_id, score in fused[:top_k]]
+    
+    def _dense_search(self, queries: List[str], top_k: int, filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """Embedding search: one batched encode and one multi-query lookup."""
+        if self.passages is not None:
+            return self._passage_search(queries, top_k, filters)
+        results = self._query(
+            self.collection, queries, top_k, ["documents", "metadatas", "distances"], filters
+        )
+        return [self._format_results(results, q) for q in range(len(queries))]
+    
+    def _passage_search(self, queries: List[str], top_k: int, filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """Search passages and aggregate hits to parent documents.
+        
+        A parent scores as its best passage; parents are returned in the
+        document-level result format so doc ids match the judge's. Passages
+        carry their parent's metadata, so filters apply to them directly.
+        """
+        results = self._query(
+            self.passages,
+            queries,
+            top_k * max(1, config.PASSAGE_CANDIDATES_MULTIPLIER),
+            ["metadatas", "distances"],
+            filters
+        )
+        
+        ranked_parents = []
+        for q in range(len(queries)):
+            best: Dict[str, float] = {}
+            for metadata, distance in zip(results["metadatas"][q], results["distances"][q]):
+                parent_id = (metadata or {}).get("parent_id")
+                if parent_id is not None and parent_id not in best:
+                    best[parent_id] = 1 - distance  # hits are sorted, first is best
+            ranked_parents.append(list(best.items())[:top_k])
+        
+        parent_ids = sorted({parent_id for ranked in ranked_parents for parent_id, _ in ranked})
+        parents = {}
+        if parent_ids:
+            stored = self.collection.get(ids=parent_ids, include=["documents", "metadatas"])
+            for i, doc_id in enumerate(stored["ids"]):
+                parents[doc_id] = (
+                    stored["documents"][i],
+                    public_metadata(stored["metadatas"][i]) if stored["metadatas"] else {},
+                )
+        
+        return [
+            [
+                {
+                    "doc_id": parent_id,
+                    "content": parents[parent_id][0],
+                    "score": score,
+                    "metadata": parents[parent_id][1],
+                }
+                for parent_id, score in ranked
+                if parent_id in parents
+            ]
+            for ranked in ranked_parents
+        ]
+    
+    def _lexical_search(self, queries: List[str], top_k: int, filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """BM25 search over the same documents as the collection."""
+        index = self.get_lexical_index()
+        candidate_ids = self.get_metadata_index().candidates(filters) if filters else None
+        return [index.search_documents(q, top_k, candidate_ids) for q in queries]
+    
+    def _hybrid_search(self, queries: List[str], top_k: int, filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """Fuse dense and BM25 rankings with reciprocal-rank fusion.
+        
+        The returned score is the fused RRF score, not a cosine similarity.
+        """
+        n_candidates = top_k * max(1, config.HYBRID_CANDIDATES_MULTIPLIER)
+        dense = self._dense_search(queries, n_candidates, filters)
+        lexical = self._lexical_search(queries, n_candidates, filters)
+        
+        fused_results = []
+        for dense_hits, lexical_hits in zip(dense, lexical):
+            by_id = {hit["doc_id"]: hit for hit in lexical_hits}
+            by_id.update({hit["doc_id"]: hit for hit in dense_hits})
+            fused = reciprocal_rank_fusion(
+                [[hit["doc_id"] for hit in dense_hits], [hit["doc_id"] for hit in lexical_hits]],
+                k=config.RRF_K
+            )
+            fused_results.append([
+                dict(by_id[doc_id], score=score) for doc_id, score in fused[:top_k]
+            ])
+        return fused_results
+    
+    def get_lexical_index(self) -> BM25Index:
+        """Return the BM25 index, (re)building it from the collection if stale."""
+        with self._lexical_lock:
+            if self._lexical_index is None or self._lexical_version != self.version:
+                version = self.version
+                stored = self.collection.get(include=["documents", "metadatas"])
+                documents = [
+                    {
+                        "id": doc_id,
+                        "content": stored["documents"][i],
+                        "metadata": public_metadata(stored["metadatas"][i]) if stored["metadatas"] else {},
+                    }
+                    for i, doc_id in enumerate(stored["ids"])
+                ]
+                self._lexical_index = BM25Index(documents)
+                self._lexical_version = version
+            return self._lexical_index
+    
+    def get_clause_graph(self) -> ClauseGraph:
+        """Return the clause cross-reference graph, rebuilding it if stale."""
+        with self._clause_graph_lock:
+            if self._clause_graph is None or self._clause_graph_version != self.version:
+                version = self.version
+                # The BM25 index already holds the current documents
+                self._clause_graph = ClauseGraph(self.get_lexical_index().documents)
+                self._clause_graph_version = version
+            return self._clause_graph
+    
+    def get_metadata_index(self, passages: bool = False) -> MetadataIndex:
+        """Return the metadata index of the documents (or passages), rebuilt if stale."""
+        collection = self.passages if passages else self.collection
+        with self._metadata_lock:
+            version, index = self._metadata_indexes.get(collection.name, (None, None))
+            if index is None or version != self.version:
+                version = self.version
+                stored = collection.get(include=["metadatas"])
+                index = MetadataIndex(
+                    stored["ids"],
+                    [public_metadata(m) for m in stored["metadatas"]] if stored["metadatas"] else [],
+                )
+                self._metadata_indexes[collection.name] = (version, index)
+            return index
+    
+    @staticmethod
+    def _format_results(results: Dict[str, Any], q: int) -> List[Dict[str, Any]]:
+        """Format the hits for the q-th query of a collection query result."""
         formatted_results = []
-        for i in range(len(results["ids"][0])):
+        for i in range(len(results["ids"][q])):
             formatted_results.append({
-                "doc_id": results["ids"][0][i],
-                "content": results["documents"][0][i],
-                "score": 1 - results["distances"][0][i],  # Convert distance to similarity
-                "metadata": results["metadatas"][0][i] if results["metadatas"] else {}
+                "doc_id": results["ids"][q][i],
+                "content": results["documents"][q][i],
+                "score": 1 - results["distances"][q][i],  # Convert distance to similarity
+                "metadata": public_metadata(results["metadatas"][q][i]) if results["metadatas"] else {}
             })
         
         return formatted_results
     
     def get_document(self, doc_id: str) -> Dict[str, Any]:
         """Get a specific document by ID."""
-        result = self.collection.get(ids=[doc_id], include=["documents", "metadatas"])
-        if result["ids"]:
-            return {
-                "doc_id": result["ids"][0],
-                "content": result["documents"][0],
-                "metadata": result["metadatas"][0] if result["metadatas"] else {}
+        documents = self.get_documents([doc_id])
+        return documents[0] if documents else None
+    
+    def get_documents(self, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        """Get several documents with a single collection lookup.
+        
+        Found documents are returned in the order of `doc_ids` (duplicates
+        once); unknown ids are left out.
+        """
+        unique_ids = list(dict.fromkeys(doc_ids))
+        result = self.collection.get(ids=unique_ids, include=["documents", "metadatas"])
+        found = {
+            doc_id: {
+                "doc_id": doc_id,
+                "content": result["documents"][i],
+                "metadata": public_metadata(result["metadatas"][i]) if result["metadatas"] else {}
             }
-        return None
+            for i, doc_id in enumerate(result["ids"])
+        }
+        return [found[doc_id] for doc_id in unique_ids if doc_id in found]
     
     def count(self) -> int:
         """Get the number of documents in the collection."""
         return self.collection.count()
 
 
-# Global instances
+def expansion_queries(query: str, variants: List[str] = None) -> List[str]:
+    """The query followed by its reformulations, without duplicates.
+    
+    If `variants` is None, cheap lexical variants are generated instead.
+    """
+    if variants is None:
+        variants = lexical_variants(query)
+    queries = {}
+    for q in [query] + list(variants):
+        if q.strip():
+            queries.setdefault(normalize_query(q), q)
+    return list(queries.values())
+
+
+# Global instances (created once under _init_lock, so concurrent first
+# requests never load the same collection twice)
 factcheck_kb = None
 legal_kb = None
+_init_lock = threading.Lock()
+
+
+def _sync_stamp_path(collection_name: str) -> str:
+    return os.path.join(config.SYNC_STAMP_DIR, collection_name)
+
+
+def read_sync_stamp(collection_name: str):
+    """Identity of the last sync stamp written for a collection (None if none).
+    
+    A stat call, cheap enough to make before every search.
+    """
+    try:
+        stat = os.stat(_sync_stamp_path(collection_name))
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def publish_sync_stamp(collection_name: str):
+    """Tell the other worker processes that a collection changed.
+    
+    The stamp file is replaced atomically; each process compares it with the
+    stamp its KB was loaded at (KnowledgeBase.is_stale) and reloads the KB
+    when they differ. Returns the new stamp.
+    """
+    os.makedirs(config.SYNC_STAMP_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=config.SYNC_STAMP_DIR, prefix=f".{collection_name}-")
+    with os.fdopen(fd, "w") as f:
+        f.write(f"{os.getpid()} {next(_corpus_versions)}\n")
+    os.replace(tmp_path, _sync_stamp_path(collection_name))
+    return read_sync_stamp(collection_name)
+
+
+def corpus_vectors(collection_name: str, documents: List[Dict[str, Any]], data_file: str):
+    """Return an `embeddings_for(rows)` provider for KnowledgeBase.sync_documents.
+    
+    Vectors come from the build-time index artifact or the persisted matrix
+    next to the data file when they match the current corpus, so no encoder
+    call is needed. Otherwise a full (re)load embeds and persists the whole
+    corpus, while a partial sync only encodes the changed documents.
+    """
+    def embeddings_for(rows: List[int]):
+        full = len(rows) == len(documents) and rows == list(range(len(documents)))
+        
+        matrix = None
+        artifact = load_index_artifact(config.INDEX_DIR, collection_name, EMBEDDING_MODEL)
+        if artifact is not None and artifact["content_hash"] == corpus_hash(documents):
+            print(f"Using pre-built index artifact for {collection_name} KB")
+            matrix = artifact["embeddings"]
+        elif full:
+            matrix = load_corpus_embeddings(documents, data_file, EMBEDDING_MODEL, embedding_function)
+        else:
+            matrix = find_corpus_embeddings(documents, data_file, EMBEDDING_MODEL)
+        
+        if matrix is None:
+            return embedding_function([documents[i]["content"] for i in rows])
+        return matrix if full else matrix[rows]
+    
+    return embeddings_for
+
+
+def sync_factcheck_kb(kb: KnowledgeBase = None) -> Dict[str, int]:
+    """Incrementally sync the fact-check KB with the Wikipedia articles.
+    
+    Without `kb`, the global KB is synced and, if it changed, the other
+    worker processes are told to reload it.
+    """
+    from knowledge_base.data_loader import load_wikipedia_articles, WIKIPEDIA_ARTICLES_FILE
+    publish = kb is None
+    if publish:
+        # Loading the KB already applies the changes, so compare with the KB
+        # loaded before (none counts as changed)
+        version = factcheck_kb.version if factcheck_kb is not None else None
+        kb = init_factcheck_kb()
+    else:
+        version = kb.version
+    documents = load_wikipedia_articles()
+    # init_factcheck_kb already holds the process lock for its own sync
+    with _sync_lock(kb.backend) if publish else nullcontext():
+        summary = kb.sync_documents(
+            documents, corpus_vectors("factcheck", documents, WIKIPEDIA_ARTICLES_FILE)
+        )
+    if publish and kb.version != version:
+        kb.sync_stamp = publish_sync_stamp("factcheck")
+    print(f"Synced fact-check KB with {len(documents)} Wikipedia articles: {summary}")
+    return summary
+
+
+def sync_legal_kb(kb: KnowledgeBase = None) -> Dict[str, int]:
+    """Incrementally sync the legal KB with the zoning law clauses.
+    
+    Without `kb`, the global KB is synced and, if it changed, the other
+    worker processes are told to reload it.
+    """
+    from knowledge_base.data_loader import load_zoning_laws, ZONING_LAWS_FILE
+    publish = kb is None
+    if publish:
+        # Loading the KB already applies the changes, so compare with the KB
+        # loaded before (none counts as changed)
+        version = legal_kb.version if legal_kb is not None else None
+        kb = init_legal_kb()
+    else:
+        version = kb.version
+    documents = load_zoning_laws()
+    # init_legal_kb already holds the process lock for its own sync
+    with _sync_lock(kb.backend) if publish else nullcontext():
+        summary = kb.sync_documents(
+            documents, corpus_vectors("legal", documents, ZONING_LAWS_FILE)
+        )
+    if publish and kb.version != version:
+        kb.sync_stamp = publish_sync_stamp("legal")
+    print(f"Synced legal KB with {len(documents)} zoning law clauses: {summary}")
+    # Precompute the clause graph used by expand_related searches
+    print(f"Legal clause graph has {len(kb.get_clause_graph())} links")
+    return summary
+
+
+def _reload_for(kb: KnowledgeBase) -> None:
+    """Prepare to reload a KB that another process has synced."""
+    if kb.backend == "chroma":
+        reopen_chroma_client()
+    print(f"Reloading {kb.collection_name} KB after a sync in another process")
 
 
 def init_factcheck_kb() -> KnowledgeBase:
-    """Initialize the fact-checking knowledge base."""
+    """Initialize the fact-checking knowledge base.
+    
+    Reloads it when another worker process has synced it since.
+    """
     global factcheck_kb
-    if factcheck_kb is None:
-        factcheck_kb = KnowledgeBase("factcheck")
-        
-        # Load documents if collection is empty
-        if factcheck_kb.count() == 0:
-            from knowledge_base.data_loader import load_wikipedia_articles
-            documents = load_wikipedia_articles()
-            if documents:
-                factcheck_kb.add_documents(documents)
-                print(f"Loaded {len(documents)} Wikipedia articles into fact-check KB")
+    if factcheck_kb is None or factcheck_kb.is_stale():
+        with _init_lock:
+            if factcheck_kb is None or factcheck_kb.is_stale():
+                if factcheck_kb is not None:
+                    _reload_for(factcheck_kb)
+                # Other processes may be creating or syncing the same collection
+                with _sync_lock(config.collection_backend("factcheck")):
+                    kb = KnowledgeBase("factcheck")
+                    # Upsert new/changed articles and drop removed ones
+                    sync_factcheck_kb(kb)
+                factcheck_kb = kb
     
     return factcheck_kb
 
 
 def init_legal_kb() -> KnowledgeBase:
-    """Initialize the legal/zoning knowledge base."""
+    """Initialize the legal/zoning knowledge base.
+    
+    Reloads it when another worker process has synced it since.
+    """
     global legal_kb
-    if legal_kb is None:
-        legal_kb = KnowledgeBase("legal")
-        
-        # Load documents if collection is empty
-        if legal_kb.count() == 0:
-            from knowledge_base.data_loader import load_zoning_laws
-            documents = load_zoning_laws()
-            if documents:
-                legal_kb.add_documents(documents)
-                print(f"Loaded {len(documents)} zoning law clauses into legal KB")
+    if legal_kb is None or legal_kb.is_stale():
+        with _init_lock:
+            if legal_kb is None or legal_kb.is_stale():
+                if legal_kb is not None:
+                    _reload_for(legal_kb)
+                # Other processes may be creating or syncing the same collection
+                with _sync_lock(config.collection_backend("legal")):
+                    kb = KnowledgeBase("legal")
+                    # Upsert new/changed clauses and drop removed ones
+                    sync_legal_kb(kb)
+                legal_kb = kb
     
     return legal_kb
+
+
+def reset_after_fork():
+    """Drop state inherited from the parent that is not fork-safe.
+    
+    Chroma-backed KBs and the Chroma client are re-created on first use in
+    this process. NumPy-backed KBs are kept and shared copy-on-write with the
+    parent. ONNX sessions own a thread pool and the embedding-service client
+    owns sockets, neither of which survive a fork, so those embedding
+    functions are re-created too; the sentence-transformers model is kept.
+    """
+    global _chroma_client, _chroma_client_pid, _embedding_function, factcheck_kb, legal_kb
+    if _chroma_client_pid != os.getpid():
+        _chroma_client = None
+        _chroma_client_pid = None
+    if factcheck_kb is not None and factcheck_kb.backend != "numpy":
+        factcheck_kb = None
+    if legal_kb is not None and legal_kb.backend != "numpy":
+        legal_kb = None
+    if config.EMBEDDING_BACKEND == "onnx" or config.EMBEDDING_SERVICE_SOCKET:
+        _embedding_function = None
@@ -0,0 +1,77 @@
+"""
+Startup warmup for the knowledge bases.
+
+Loads both collections and runs a throwaway query through the embedding model
+before the worker reports ready, so the first real searches don't pay for
+collection loading and cold model weights. Warmup runs at most once per
+process; concurrent callers wait for the run in progress. A failed warmup can
+be run again (GET /ready retries it in the background).
+"""
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict
+
+WARMUP_QUERY = "warmup query"
+
+
+class WarmupState:
+    """Readiness flag plus per-phase timings of the warmup run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = False
+        self.running = False
+        self.ready = False
+        self.error = None
+        self.phases: Dict[str, float] = {}
+
+    def run_phase(self, name: str, fn: Callable[[], Any]) -> Any:
+        """Run one warmup phase and record its duration in milliseconds."""
+        started = time.perf_counter()
+        result = fn()
+        elapsed_ms = round(1000 * (time.perf_counter() - started), 1)
+        self.phases[name] = elapsed_ms
+        print(f"KB warmup: {name} took {elapsed_ms} ms")
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started": self.started,
+            "ready": self.ready,
+            "error": self.error,
+            "phases_ms": dict(self.phases),
+            "total_ms": round(sum(self.phases.values()), 1),
+        }
+
+
+warmup_state = WarmupState()
+
+
+def warm_up() -> Dict[str, Any]:
+    """Initialize both KBs and warm the embedding model (single-flight)."""
+    from knowledge_base.vector_store import init_factcheck_kb, init_legal_kb, embed_queries
+
+    with warmup_state._lock:
+        if warmup_state.ready:
+            return warmup_state.to_dict()
+        warmup_state.started = True
+        warmup_state.running = True
+        warmup_state.error = None
+        try:
+            factcheck = warmup_state.run_phase("factcheck_kb", init_factcheck_kb)
+            legal = warmup_state.run_phase("legal_kb", init_legal_kb)
+            warmup_state.run_phase("embedding_model", lambda: embed_queries([WARMUP_QUERY]))
+            # Exercises the collection lookups without filling the result cache
+            warmup_state.run_phase("dummy_query", lambda: (
+                factcheck._dense_search([WARMUP_QUERY], 1),
+                legal._dense_search([WARMUP_QUERY], 1),
+            ))
+            warmup_state.ready = True
+        except Exception as e:
+            warmup_state.error = repr(e)
+            print(f"KB warmup failed: {e!r}")
+            traceback.print_exc()
+        finally:
+            warmup_state.running = False
+        return warmup_state.to_dict()
@@ -1,11 +1,18 @@
 """
 RAG Challenge Platform - Backend API
 """
+import time
+_import_started = time.perf_counter()
+
 from dotenv import load_dotenv
 load_dotenv()  # Load .env file
 
+import asyncio
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 
 from db.database import init_db
@@ -13,13 +20,43 @@ from knowledge_base.router import router as kb_router
 from submissions.router import router as submissions_router
 from evaluation.router import router as evaluation_router
 from public.router import router as public_router
+from knowledge_base import config as kb_config
+from knowledge_base.warmup import warm_up, warmup_state
+
+# Cold-start breakdown in milliseconds: import, db_init, seed and kb_init
+startup_timings = {"import": round(1000 * (time.perf_counter() - _import_started), 1)}
+warmup_retry_task = None
+
+
+def log_startup_report():
+    """Print the cold-start phase breakdown."""
+    phases = ", ".join(f"{name} {ms} ms" for name, ms in startup_timings.items())
+    print(f"Startup timings: {phases} (total {round(sum(startup_timings.values()), 1)} ms)")
+
+
+async def warm_up_and_report():
+    """Warm up the KBs off the event loop, then log the startup report."""
+    status = await asyncio.to_thread(warm_up)
+    startup_timings["kb_init"] = status["total_ms"]
+    log_startup_report()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize database and vector stores on startup."""
-    await init_db()
+    # Under gunicorn the master has already created and seeded the database
+    if os.getenv("DB_INITIALIZED") != "1":
+        await init_db(startup_timings)
+    warmup_task = None
+    if kb_config.WARMUP:
+        # Warm up in the background so liveness checks answer right away;
+        # /ready reports 503 until the KBs and model are loaded
+        warmup_task = asyncio.create_task(warm_up_and_report())
+    else:
+        log_startup_report()
     yield
+    if warmup_task is not None and not warmup_task.done():
+        await warmup_task
 
 
 app = FastAPI(
@@ -58,6 +95,20 @@ async def root():
     return {"message": "RAG Challenge Platform API", "version": "1.0.0"}
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the knowledge bases are warmed up, else 503."""
+    status = {**warmup_state.to_dict(), "startup_ms": startup_timings}
+    if warmup_state.ready or not kb_config.WARMUP:
+        return {**status, "ready": True}
+    if warmup_state.error is not None and not warmup_state.running:
+        # Retry a failed warmup (e.g. a transient error while loading the KBs)
+        global warmup_retry_task
+        warmup_state.running = True
+        warmup_retry_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    return JSONResponse(status_code=503, content=status)
+
+
 @app.get("/api/challenges")
 async def get_challenges():
     """Return list of available challenges."""
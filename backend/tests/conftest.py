@@ -0,0 +1,70 @@
+"""
+Shared fixtures for the knowledge base tests.
+
+The KBs run against copies of the corpus in a temporary directory, with a
+deterministic hashing embedder instead of the sentence-transformers model, so
+the tests need neither the model nor network access.
+"""
+import hashlib
+import re
+import shutil
+
+import numpy as np
+import pytest
+
+EMBEDDING_DIM = 64
+
+
+class HashingEmbeddingFunction:
+    """Bag-of-words vectors: each token adds 1 to a hashed dimension."""
+
+    def __call__(self, input):
+        vectors = np.full((len(input), EMBEDDING_DIM), 0.01, dtype=np.float32)
+        for row, text in enumerate(input):
+            for token in re.findall(r"\w+", text.lower()):
+                vectors[row, int(hashlib.md5(token.encode()).hexdigest(), 16) % EMBEDDING_DIM] += 1.0
+        return vectors.tolist()
+
+
+@pytest.fixture
+def kb_env(tmp_path, monkeypatch):
+    """Isolated KB state: corpus copies, Chroma path, sync stamps and embedder
+    under `tmp_path`, and no KB loaded. Yields the corpus paths."""
+    from knowledge_base import config, data_loader, vector_store
+    from knowledge_base.warmup import warmup_state
+
+    corpus = {}
+    for name in ("WIKIPEDIA_ARTICLES_FILE", "ZONING_LAWS_FILE"):
+        path = tmp_path / "data" / name.lower()
+        path.mkdir(parents=True)
+        corpus[name] = str(path / "corpus.json")
+        shutil.copy(getattr(data_loader, name), corpus[name])
+        monkeypatch.setattr(data_loader, name, corpus[name])
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "INDEX_DIR", str(tmp_path / "kb_index"))
+    monkeypatch.setattr(config, "SYNC_STAMP_DIR", str(tmp_path / "kb_sync"))
+    monkeypatch.setattr(vector_store, "_embedding_function", HashingEmbeddingFunction())
+    monkeypatch.setattr(vector_store, "factcheck_kb", None)
+    monkeypatch.setattr(vector_store, "legal_kb", None)
+    monkeypatch.setattr(warmup_state, "ready", False)
+    vector_store.reopen_chroma_client()
+    for cache in (vector_store.query_embedding_cache, vector_store.search_result_cache):
+        cache.clear()
+
+    yield corpus
+
+    vector_store.reopen_chroma_client()
+    for cache in (vector_store.query_embedding_cache, vector_store.search_result_cache):
+        cache.clear()
+
+
+@pytest.fixture(params=["numpy", "chroma"])
+def backend(request, monkeypatch):
+    """Run the test against each collection backend."""
+    from knowledge_base import config
+
+    if request.param == "chroma":
+        pytest.importorskip("chromadb")
+    monkeypatch.setattr(config, "collection_backend", lambda collection: request.param)
+    return request.param
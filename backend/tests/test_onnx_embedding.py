@@ -0,0 +1,118 @@
+"""
+Parity of the int8 ONNX embedder with sentence-transformers.
+
+The pooling and parity-report tests run anywhere. The drift test needs an
+exported model (`python -m knowledge_base.onnx_embedding export`) and is
+skipped without one.
+"""
+import os
+import sys
+import types
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from knowledge_base import config, onnx_embedding
+from knowledge_base.onnx_embedding import (
+    DEFAULT_MAX_DRIFT,
+    DEFAULT_MIN_OVERLAP,
+    MODEL_FILE,
+    TOKENIZER_FILE,
+    OnnxEmbeddingFunction,
+    check_parity,
+    parity_texts,
+)
+
+
+def _stub_embedder(lengths, token_embeddings):
+    """An OnnxEmbeddingFunction whose tokenizer pads texts of the given token
+    lengths and whose session returns `token_embeddings`."""
+    seq_len = token_embeddings.shape[1]
+    encodings = [
+        SimpleNamespace(
+            ids=list(range(1, n + 1)) + [0] * (seq_len - n),
+            attention_mask=[1] * n + [0] * (seq_len - n),
+            type_ids=[0] * seq_len,
+        )
+        for n in lengths
+    ]
+    embedder = OnnxEmbeddingFunction.__new__(OnnxEmbeddingFunction)
+    embedder.tokenizer = SimpleNamespace(encode_batch=lambda texts: encodings)
+    embedder.session = SimpleNamespace(run=lambda outputs, feeds: [token_embeddings])
+    embedder._input_names = {"input_ids", "attention_mask"}
+    return embedder
+
+
+def test_encode_pools_like_sentence_transformers():
+    torch = pytest.importorskip("torch")
+    models = pytest.importorskip("sentence_transformers.models")
+
+    rng = np.random.default_rng(0)
+    lengths = [3, 7, 1]
+    token_embeddings = rng.normal(size=(len(lengths), 7, 16)).astype(np.float32)
+    # Padding positions must not leak into the mean
+    token_embeddings[0, 3:] = 100.0
+
+    vectors = _stub_embedder(lengths, token_embeddings).encode(["a", "b", "c"])
+
+    features = {
+        "token_embeddings": torch.from_numpy(token_embeddings),
+        "attention_mask": torch.tensor([[1] * n + [0] * (7 - n) for n in lengths]),
+    }
+    features = models.Pooling(16, pooling_mode="mean")(features)
+    expected = models.Normalize()(features)["sentence_embedding"].numpy()
+    np.testing.assert_allclose(vectors, expected, atol=1e-6)
+
+
+def test_check_parity_measures_drift_and_top_k_overlap(monkeypatch):
+    rng = np.random.default_rng(0)
+    reference = rng.normal(size=(30, 8)).astype(np.float32)
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = reference.copy()
+    candidate[-1] = -candidate[-1]  # one query points the other way
+
+    class FakeSentenceTransformer:
+        def __init__(self, model_name, device=None):
+            pass
+
+        def encode(self, texts, normalize_embeddings, convert_to_numpy):
+            return reference[:len(texts)]
+
+    class FakeOnnxEmbeddingFunction:
+        def __init__(self, model_dir):
+            pass
+
+        def encode(self, texts):
+            return candidate[:len(texts)]
+
+    monkeypatch.setitem(
+        sys.modules, "sentence_transformers",
+        types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer),
+    )
+    monkeypatch.setattr(onnx_embedding, "OnnxEmbeddingFunction", FakeOnnxEmbeddingFunction)
+
+    documents = [f"doc {i}" for i in range(20)]
+    queries = [f"query {i}" for i in range(10)]
+    report = check_parity("unused", "unused", documents, queries, top_k=5)
+
+    assert report["texts"] == 30
+    assert report["max_drift"] == pytest.approx(2.0, abs=1e-5)
+    assert report["mean_drift"] == pytest.approx(2.0 / 30, abs=1e-5)
+    # The flipped query keeps none of its top 5 documents, the others all
+    assert report["top_k_overlap"] == pytest.approx(0.9)
+
+
+@pytest.mark.skipif(
+    not all(os.path.exists(os.path.join(config.ONNX_MODEL_DIR, name)) for name in (MODEL_FILE, TOKENIZER_FILE)),
+    reason="no exported ONNX model in KB_ONNX_MODEL_DIR",
+)
+def test_onnx_drift_within_limits():
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("sentence_transformers")
+
+    texts = parity_texts()
+    report = check_parity(config.ONNX_MODEL_DIR, config.EMBEDDING_MODEL, texts["documents"], texts["queries"])
+
+    assert report["max_drift"] <= DEFAULT_MAX_DRIFT, report
+    assert report["top_k_overlap"] >= DEFAULT_MIN_OVERLAP, report
@@ -0,0 +1,76 @@
+"""
+Fork safety and cross-worker reloads of the knowledge bases.
+
+Each test forks real processes, as the pre-fork server (gunicorn.conf.py)
+does, and runs for both collection backends.
+"""
+import json
+import multiprocessing
+
+from knowledge_base import prefork, vector_store
+
+QUERY = "zebra giraffe penguin aquarium"
+
+
+def _run_in_child(fn) -> int:
+    """Run `fn` in a forked worker process; returns its exit code."""
+    def worker():
+        vector_store.reset_after_fork()
+        fn()
+
+    process = multiprocessing.get_context("fork").Process(target=worker)
+    process.start()
+    process.join(120)
+    return process.exitcode
+
+
+def _top_ids(kb):
+    dense = kb.search(QUERY, top_k=1)
+    lexical = kb.search(QUERY, top_k=1, mode="lexical")
+    return dense[0]["doc_id"], lexical[0]["doc_id"] if lexical else None
+
+
+def test_prefork_check_workers_search_both_kbs(kb_env, backend):
+    assert prefork.check(workers=2, timeout=120)
+    # The master never opens a Chroma client
+    vector_store.assert_fork_safe()
+
+
+def test_sync_in_one_worker_reloads_the_others(kb_env, backend):
+    reader_kb = vector_store.init_legal_kb()
+    assert reader_kb.backend == backend
+    target = "clause_A_1"
+    assert _top_ids(reader_kb) != (target, target)
+
+    with open(kb_env["ZONING_LAWS_FILE"]) as f:
+        clauses = json.load(f)
+    clause = next(c for c in clauses if c["id"] == target)
+    clause["content"] = f"{QUERY} {QUERY}"
+    with open(kb_env["ZONING_LAWS_FILE"], "w") as f:
+        json.dump(clauses, f)
+
+    def admin_sync():
+        # A worker that has not loaded the legal KB yet: loading it applies
+        # the edit, and the sync must still tell the other workers
+        vector_store.legal_kb = None
+        vector_store.sync_legal_kb()
+
+    assert _run_in_child(admin_sync) == 0
+
+    assert reader_kb.is_stale()
+    kb = vector_store.init_legal_kb()
+    assert kb is not reader_kb
+    assert _top_ids(kb) == (target, target)
+    assert not kb.is_stale()
+
+
+def test_sync_that_changes_nothing_keeps_other_workers_loaded(kb_env, backend):
+    reader_kb = vector_store.init_legal_kb()
+
+    def admin_sync():
+        vector_store.init_legal_kb()
+        vector_store.sync_legal_kb()
+
+    assert _run_in_child(admin_sync) == 0
+    assert not reader_kb.is_stale()
+    assert vector_store.init_legal_kb() is reader_kb
@@ -0,0 +1,33 @@
+"""
+Validation of the knowledge base search request bodies.
+"""
+import pytest
+from pydantic import ValidationError
+
+from db.models import BatchSearchRequest, ExpandedSearchRequest, SearchOptions, SearchRequest
+
+
+@pytest.mark.parametrize("blank", ["", "   ", " \t\n"])
+@pytest.mark.parametrize("build", [
+    lambda q: SearchRequest(query=q),
+    lambda q: BatchSearchRequest(queries=["building height", q]),
+    lambda q: ExpandedSearchRequest(query=q),
+])
+def test_blank_queries_are_rejected(build, blank):
+    with pytest.raises(ValidationError):
+        build(blank)
+
+
+def test_queries_are_kept_as_given():
+    assert SearchRequest(query=" height limit ").query == " height limit "
+    assert BatchSearchRequest(queries=["a", "b"]).queries == ["a", "b"]
+    assert ExpandedSearchRequest(query="parking").query == "parking"
+
+
+@pytest.mark.parametrize("request_model", [SearchRequest, BatchSearchRequest, ExpandedSearchRequest])
+def test_every_search_request_takes_the_shared_options(request_model):
+    options = {"mode": "hybrid", "filters": {"zone": "B"}, "rerank": True, "snippet": True, "include_content": False}
+    body = {"queries": ["height"]} if request_model is BatchSearchRequest else {"query": "height"}
+    parsed = request_model(**body, **options)
+    assert isinstance(parsed, SearchOptions)
+    assert {name: getattr(parsed, name) for name in options} == options